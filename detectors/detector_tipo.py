@@ -1,53 +1,222 @@
 # detectors/detector_tipo.py
 import re
+from collections import Counter
+
+from bs4.element import NavigableString
+
+from utils.parseo import DocumentoPagina
+
+RE_PRECIO = re.compile(r'(?:[$€£]\s?\d{1,5}(?:[.,]\d{2})?|\d{1,5}(?:[.,]\d{2})?\s?(?:€|usd|eur))', re.I)
+RE_FORM_FORO = re.compile(r'post|reply')
+RE_CLASE_FORO = re.compile(r'thread|topic')
+RE_CLASE_BLOG = re.compile(r'entry|post-content|byline|author')
+RE_CLASE_PAGINACION = re.compile(r'pagination|pager|page-nav')
+RE_CLASE_SOCIAL = re.compile(r'tweet|retweet|like-count|share-count')
+RE_CLASE_ECOMMERCE = re.compile(r'add-to-cart|cart|price|precio|product')
+
+PALABRAS_FORO = ('foro', 'tema', 'respuesta', 'post', 'comentario', 'debate', 'forum', 'thread', 'reply')
+PALABRAS_BLOG = ('blog', 'artículo', 'autor', 'leer más', 'read more', 'posted by')
+REDES_SOCIALES = ('twitter', 'facebook', 'instagram', 'tiktok', 'reddit', 'x.com')
+IDS_APP_JS = ('root', 'app', '__next', '__nuxt')
+TAGS_SIN_TEXTO = ('script', 'style', 'noscript', 'template')
+
+
+class SenalesPagina:
+    """
+    Señales del detector recogidas en UN recorrido del árbol ya parseado:
+    conteo de tags, tokens de clase, ids de formularios, meta tags, textos con
+    precio y palabras clave. Evita str(soup) y soup.get_text() del documento entero.
+    """
+
+    def __init__(self, soup):
+        self.tags = Counter()
+        self.clases = Counter()
+        self.ids = set()
+        self.form_ids = []
+        self.meta = {}
+        self.itemprops = set()
+        self.precios = 0
+        self.chars_texto = 0
+        self.palabras = set()
+        self._recorrer(soup)
+
+    def _recorrer(self, soup):
+        pendientes = set(PALABRAS_FORO + PALABRAS_BLOG)
+        pila = [(soup, False)]
+
+        while pila:
+            nodo, sin_texto = pila.pop()
+
+            if isinstance(nodo, NavigableString):
+                # Comentarios, doctype, etc. son subclases: solo cuenta texto visible
+                if sin_texto or type(nodo) is not NavigableString:
+                    continue
+                texto = nodo.strip()
+                if not texto:
+                    continue
+                self.chars_texto += len(texto)
+                if len(texto) < 60 and RE_PRECIO.search(texto):
+                    self.precios += 1
+                if pendientes:
+                    texto = texto.lower()
+                    encontradas = {p for p in pendientes if p in texto}
+                    if encontradas:
+                        self.palabras |= encontradas
+                        pendientes -= encontradas
+                continue
+
+            nombre = nodo.name
+            if nombre != '[document]':
+                self.tags[nombre] += 1
+                for token in nodo.get('class') or ():
+                    self.clases[token.lower()] += 1
+                id_elem = nodo.get('id')
+                if id_elem:
+                    self.ids.add(id_elem.lower())
+                if nodo.get('itemprop'):
+                    self.itemprops.add(nodo['itemprop'].lower())
+
+                if nombre == 'meta':
+                    clave = nodo.get('property') or nodo.get('name')
+                    if clave:
+                        self.meta[clave.lower()] = (nodo.get('content') or '').lower()
+                elif nombre == 'form' and id_elem:
+                    self.form_ids.append(id_elem)
+
+            hijo_sin_texto = sin_texto or nombre in TAGS_SIN_TEXTO
+            hijos = nodo.contents
+            for hijo in reversed(hijos):
+                pila.append((hijo, hijo_sin_texto))
+
+    def hay_clase(self, patron):
+        return any(patron.search(token) for token in self.clases)
+
+    def max_repeticion_clase(self):
+        """Cuántas veces aparece el token de clase más repetido (listas de items)"""
+        return max(self.clases.values(), default=0)
+
 
 class DetectorTipoPagina:
     """Detecta automáticamente el tipo de página web"""
-    
-    def detectar(self, soup):
-        """Analiza el HTML para determinar el tipo de contenido"""
-        
-        html_str = str(soup)
-        texto = soup.get_text().lower()
-        
+
+    def detectar(self, pagina):
+        """
+        Analiza el HTML para determinar el tipo de contenido.
+        `pagina` puede ser un DocumentoPagina (el resultado queda cacheado en él) o un soup.
+        """
+        return self.analizar(pagina)['tipo']
+
+    def analizar(self, pagina):
+        """
+        Devuelve {'tipo', 'scores', 'necesita_js'}.
+        Con un DocumentoPagina se calcula una sola vez y se guarda en `pagina.deteccion`.
+        """
+        es_documento = isinstance(pagina, DocumentoPagina)
+        if es_documento and pagina.deteccion is not None:
+            return pagina.deteccion
+
+        soup = pagina.soup if es_documento else pagina
+        senales = SenalesPagina(soup)
+
         # Puntuación por tipo
         scores = {
-            'foro': 0,
-            'blog': 0,
-            'listado': 0,
-            'ecommerce': 0,
-            'red_social': 0
+            'foro': self._puntuar_foro(senales),
+            'blog': self._puntuar_blog(senales),
+            'listado': self._puntuar_listado(senales),
+            'red_social': self._buscar_meta_redes_sociales(senales),
+            'ecommerce': self._buscar_precios_productos(senales)
         }
-        
-        # Análisis de contenido
-        scores['foro'] += self._puntuar_foro(soup, texto)
-        scores['blog'] += self._puntuar_blog(soup, texto)
-        scores['listado'] += self._puntuar_listado(soup)
-        
-        # Análisis de URL y metadatos
-        scores['red_social'] += self._buscar_meta_redes_sociales(soup)
-        scores['ecommerce'] += self._buscar_precios_productos(soup)
-        
+
         # Devolver el tipo con mayor puntuación
         tipo_detectado = max(scores, key=scores.get)
-        
-        # Si la puntuación es muy baja, es "desconocido"
-        return tipo_detectado if scores[tipo_detectado] > 2 else 'desconocido'
-    
-    def _puntuar_foro(self, soup, texto):
+
+        resultado = {
+            # Si la puntuación es muy baja, es "desconocido"
+            'tipo': tipo_detectado if scores[tipo_detectado] > 2 else 'desconocido',
+            'scores': scores,
+            'necesita_js': self._es_shell_js(senales)
+        }
+
+        if es_documento:
+            pagina.deteccion = resultado
+        return resultado
+
+    def _puntuar_foro(self, senales):
         """Busca características de foros"""
         puntuacion = 0
-        
+
         # Palabras clave típicas
-        palabras_foro = ['foro', 'tema', 'respuesta', 'post', 'comentario', 'debate']
-        for palabra in palabras_foro:
-            if palabra in texto:
-                puntuacion += 1
-        
+        puntuacion += sum(1 for palabra in PALABRAS_FORO if palabra in senales.palabras)
+
         # Estructuras HTML típicas
-        if soup.find('form', {'id': re.compile(r'post|reply')}):
+        if any(RE_FORM_FORO.search(form_id) for form_id in senales.form_ids):
             puntuacion += 2
-        if soup.find('div', {'class': re.compile(r'thread|topic')}):
+        if senales.hay_clase(RE_CLASE_FORO):
             puntuacion += 1
-        
-        return puntuacion
\ No newline at end of file
+
+        return puntuacion
+
+    def _puntuar_blog(self, senales):
+        """Busca características de blogs / artículos"""
+        puntuacion = 0
+
+        puntuacion += sum(1 for palabra in PALABRAS_BLOG if palabra in senales.palabras)
+
+        if senales.meta.get('og:type') == 'article' or 'article:published_time' in senales.meta:
+            puntuacion += 2
+        if senales.tags['article']:
+            puntuacion += 1
+        if senales.tags['time']:
+            puntuacion += 1
+        if senales.hay_clase(RE_CLASE_BLOG):
+            puntuacion += 1
+
+        return puntuacion
+
+    def _puntuar_listado(self, senales):
+        """Páginas con muchos items repetidos (portadas, índices de foros, resultados)"""
+        puntuacion = 0
+
+        if senales.max_repeticion_clase() >= 10:
+            puntuacion += 2
+        if senales.tags['li'] >= 20:
+            puntuacion += 1
+        if senales.hay_clase(RE_CLASE_PAGINACION):
+            puntuacion += 1
+
+        return puntuacion
+
+    def _buscar_meta_redes_sociales(self, senales):
+        """Meta tags y clases propias de redes sociales"""
+        puntuacion = 0
+
+        sitio = senales.meta.get('og:site_name', '') + ' ' + senales.meta.get('twitter:site', '')
+        if any(red in sitio for red in REDES_SOCIALES):
+            puntuacion += 3
+        if senales.hay_clase(RE_CLASE_SOCIAL):
+            puntuacion += 1
+
+        return puntuacion
+
+    def _buscar_precios_productos(self, senales):
+        """Precios en el texto y metadatos de producto"""
+        puntuacion = 0
+
+        if senales.precios >= 10:
+            puntuacion += 3
+        elif senales.precios >= 3:
+            puntuacion += 2
+        if senales.meta.get('og:type') == 'product' or 'product:price:amount' in senales.meta:
+            puntuacion += 3
+        if 'price' in senales.itemprops:
+            puntuacion += 2
+        if senales.hay_clase(RE_CLASE_ECOMMERCE):
+            puntuacion += 1
+
+        return puntuacion
+
+    def _es_shell_js(self, senales):
+        """Página que es solo un contenedor para una app JS: hace falta Selenium"""
+        if senales.chars_texto >= 500:
+            return False
+        return senales.tags['script'] >= 3 or any(i in senales.ids for i in IDS_APP_JS)
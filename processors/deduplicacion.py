@@ -0,0 +1,343 @@
+# processors/deduplicacion.py
+import threading
+import zlib
+from collections import defaultdict
+
+import numpy as np
+from rapidfuzz import fuzz, process
+
+_PRIMO = np.uint64((1 << 61) - 1)
+_MASCARA = np.uint64(0xFFFFFFFF)
+
+
+class IndiceMinHash:
+    """
+    Índice LSH (MinHash por bandas) para encontrar candidatos a casi-duplicado
+    sin comparar cada texto con todos los anteriores.
+
+    Cada texto se resume en `num_perm` mínimos de hash sobre sus shingles de
+    caracteres (con los tokens ordenados, igual que token_sort_ratio) y la firma
+    se parte en `bandas` bandas: dos textos son candidatos si coinciden en alguna
+    banda completa. Con los valores por defecto (128 perm, 32 bandas de 4) un par
+    con Jaccard 0.5 sale como candidato ~87% de las veces y uno con 0.2 ~5%.
+    Los candidatos se verifican después con la métrica real.
+    """
+
+    def __init__(self, num_perm=128, bandas=32, k=3, semilla=1):
+        if num_perm % bandas:
+            raise ValueError(f"num_perm ({num_perm}) debe ser múltiplo de bandas ({bandas})")
+        self.num_perm = num_perm
+        self.bandas = bandas
+        self.filas = num_perm // bandas
+        self.k = k
+
+        rng = np.random.RandomState(semilla)
+        self._a = rng.randint(1, 1 << 32, size=num_perm, dtype=np.uint64)
+        self._b = rng.randint(0, 1 << 32, size=num_perm, dtype=np.uint64)
+        self._buckets = [defaultdict(list) for _ in range(bandas)]
+        self._total = 0
+
+    def shingles(self, texto):
+        """Shingles de `k` caracteres del texto en minúsculas y con los tokens ordenados"""
+        base = ' '.join(sorted(texto.lower().split()))
+        if len(base) <= self.k:
+            return {base}
+        return {base[i:i + self.k] for i in range(len(base) - self.k + 1)}
+
+    def firma(self, texto):
+        hashes = np.fromiter(
+            (zlib.crc32(s.encode('utf-8')) for s in self.shingles(texto)), dtype=np.uint64
+        ) & _MASCARA
+        # (a·h + b) mod p para todas las permutaciones a la vez: matriz shingles × num_perm.
+        # Sin desbordamiento: a, b, h < 2^32, así que a·h + b <= (2^32-1)^2 + 2^32-1 < 2^64
+        valores = np.outer(hashes, self._a)
+        valores += self._b
+        valores %= _PRIMO
+        valores &= _MASCARA
+        return valores.min(axis=0)
+
+    def _claves(self, firma):
+        for banda in range(self.bandas):
+            yield banda, firma[banda * self.filas:(banda + 1) * self.filas].tobytes()
+
+    def candidatos(self, firma):
+        """Ids registrados que comparten al menos una banda con la firma (sin repetir, por orden de alta)"""
+        encontrados = set()
+        for banda, clave in self._claves(firma):
+            ids = self._buckets[banda].get(clave)
+            if ids:
+                encontrados.update(ids)
+        return sorted(encontrados)
+
+    def agregar(self, id_texto, firma):
+        for banda, clave in self._claves(firma):
+            self._buckets[banda][clave].append(id_texto)
+        self._total += 1
+
+    def __len__(self):
+        return self._total
+
+
+class DeduplicadorIncremental:
+    """
+    Deduplicación exacta + fuzzy que se alimenta item a item (streaming).
+    Un texto se conserva si no se parece (token_sort_ratio >= threshold) a
+    ninguno de los ya conservados.
+
+    Con `usar_lsh` (por defecto) solo se verifica contra los candidatos del
+    IndiceMinHash, así el coste total es ~lineal en vez de cuadrático, pero el
+    recall es aproximado: un casi-duplicado con poco solapamiento de shingles
+    puede escaparse. Con `usar_lsh=False` se compara contra todos los
+    conservados y el resultado es el de la pasada greedy de deduplicar_fuzzy
+    (exacto, O(n²)).
+    """
+
+    def __init__(self, threshold=90, usar_lsh=True, num_perm=128, bandas=32):
+        self.threshold = threshold
+        self._exactos = set()
+        self._conservados = []
+        self._indice = IndiceMinHash(num_perm=num_perm, bandas=bandas) if usar_lsh else None
+        self._lock = threading.Lock()
+        self.stats = {'vistos': 0, 'duplicados_exactos': 0, 'duplicados_fuzzy': 0, 'unicos': 0,
+                      'comparaciones': 0}
+
+    def agregar(self, texto):
+        """True si el texto es nuevo (y queda registrado), False si es duplicado"""
+        texto = (texto or '').strip()
+        # La firma no depende del estado: se calcula fuera del lock
+        firma = self._indice.firma(texto) if self._indice is not None and texto else None
+
+        with self._lock:
+            self.stats['vistos'] += 1
+            if not texto:
+                return False
+
+            if texto in self._exactos:
+                self.stats['duplicados_exactos'] += 1
+                return False
+
+            if self._es_casi_duplicado(texto, firma):
+                self._exactos.add(texto)
+                self.stats['duplicados_fuzzy'] += 1
+                return False
+
+            if self._indice is not None:
+                self._indice.agregar(len(self._conservados), firma)
+            self._exactos.add(texto)
+            self._conservados.append(texto)
+            self.stats['unicos'] += 1
+            return True
+
+    def agregar_lote(self, textos, tam_bloque=1000):
+        """
+        Procesa un lote nuevo contra todo lo ya ingerido. Devuelve un bool por texto (True = nuevo).
+        En modo exacto (usar_lsh=False) el lote se compara de una vez con matrices cdist por
+        bloques en lugar de un extractOne por texto; el resultado es el mismo que llamar a
+        agregar() uno a uno.
+        """
+        if self._indice is not None:
+            return [self.agregar(texto) for texto in textos]
+
+        textos = [(texto or '').strip() for texto in textos]
+        with self._lock:
+            self.stats['vistos'] += len(textos)
+            nuevos = [False] * len(textos)
+
+            # Exactos, en orden: un texto repetido cuenta aunque el primero se descarte luego
+            candidatos = []
+            vistos_lote = set()
+            for k, texto in enumerate(textos):
+                if not texto:
+                    continue
+                if texto in self._exactos or texto in vistos_lote:
+                    self.stats['duplicados_exactos'] += 1
+                    continue
+                vistos_lote.add(texto)
+                candidatos.append(k)
+
+            textos_candidatos = [textos[k] for k in candidatos]
+            # Contra lo ya conservado, y luego greedy dentro del lote con los pares (i < j)
+            descartados = set(np.flatnonzero(
+                _similares_a_alguno(textos_candidatos, self._conservados, self.threshold, tam_bloque)
+            ).tolist())
+            self.stats['comparaciones'] += len(textos_candidatos) * len(self._conservados)
+            for i, j in pares_similares(textos_candidatos, self.threshold, tam_bloque):
+                if i not in descartados:
+                    descartados.add(j)
+
+            for posicion, k in enumerate(candidatos):
+                self._exactos.add(textos[k])
+                if posicion in descartados:
+                    self.stats['duplicados_fuzzy'] += 1
+                    continue
+                self._conservados.append(textos[k])
+                self.stats['unicos'] += 1
+                nuevos[k] = True
+            return nuevos
+
+    def _es_casi_duplicado(self, texto, firma):
+        if not self._conservados:
+            return False
+
+        if self._indice is None:
+            self.stats['comparaciones'] += len(self._conservados)
+            return process.extractOne(
+                texto, self._conservados, scorer=fuzz.token_sort_ratio, score_cutoff=self.threshold
+            ) is not None
+
+        for i in self._indice.candidatos(firma):
+            self.stats['comparaciones'] += 1
+            if fuzz.token_sort_ratio(texto, self._conservados[i], score_cutoff=self.threshold):
+                return True
+        return False
+
+    def __len__(self):
+        return len(self._conservados)
+
+
+def _texto_por_defecto(item):
+    if isinstance(item, str):
+        return item
+    return item.get('texto') or item.get('contenido') or ''
+
+
+def pares_similares(textos, threshold=90, tam_bloque=1000, workers=-1):
+    """
+    Genera, bloque de filas a bloque de filas, los pares (i, j) con i < j y
+    token_sort_ratio >= threshold. Cada bloque es una matriz cdist de como
+    mucho tam_bloque × tam_bloque (uint8) calculada en C con todos los núcleos;
+    solo se recorre el triángulo superior. Dentro de cada bloque de filas los
+    pares salen ordenados por i.
+    """
+    n = len(textos)
+    for i0 in range(0, n, tam_bloque):
+        filas = textos[i0:i0 + tam_bloque]
+        pares = []
+        for j0 in range(i0, n, tam_bloque):
+            scores = process.cdist(
+                filas, textos[j0:j0 + tam_bloque], scorer=fuzz.token_sort_ratio,
+                score_cutoff=threshold, dtype=np.uint8, workers=workers
+            )
+            ii, jj = np.nonzero(scores)
+            ii = ii + i0
+            jj = jj + j0
+            arriba = jj > ii
+            pares.append(np.column_stack((ii[arriba], jj[arriba])))
+        bloque = np.concatenate(pares)
+        bloque = bloque[np.lexsort((bloque[:, 1], bloque[:, 0]))]
+        yield from map(tuple, bloque.tolist())
+
+
+def _similares_a_alguno(filas, columnas, threshold=90, tam_bloque=1000, workers=-1):
+    """Array bool: si cada texto de `filas` se parece (>= threshold) a alguno de `columnas`"""
+    encontrados = np.zeros(len(filas), dtype=bool)
+    if not len(filas) or not len(columnas):
+        return encontrados
+    for i0 in range(0, len(filas), tam_bloque):
+        for j0 in range(0, len(columnas), tam_bloque):
+            scores = process.cdist(
+                filas[i0:i0 + tam_bloque], columnas[j0:j0 + tam_bloque], scorer=fuzz.token_sort_ratio,
+                score_cutoff=threshold, dtype=np.uint8, workers=workers
+            )
+            encontrados[i0:i0 + len(scores)] |= scores.any(axis=1)
+    return encontrados
+
+
+def _indices_conservados(n, pares):
+    """
+    Índices que sobreviven dados los pares (i, j) similares, i < j, ordenados por i.
+    Greedy: cada conservado descarta a sus similares posteriores y un descartado
+    no descarta a nadie.
+    """
+    descartados = set()
+    for i, j in pares:
+        if i not in descartados:
+            descartados.add(j)
+    return [i for i in range(n) if i not in descartados]
+
+
+def deduplicar_fuzzy(items, threshold=90, texto=None, tam_bloque=1000, workers=-1):
+    """
+    Camino exacto y por lotes de la deduplicación fuzzy (sin LSH): las
+    similitudes salen de pares_similares en vez de un process.extract por fila.
+    Conserva la semántica greedy de siempre (ver _indices_conservados) y, como
+    antes, los items sin texto se descartan (token_sort_ratio("", "") es 100).
+    """
+    texto = texto or _texto_por_defecto
+    con_texto = []
+    textos = []
+    for i, item in enumerate(items):
+        t = (texto(item) or '').strip()
+        if t:
+            con_texto.append(i)
+            textos.append(t)
+    pares = pares_similares(textos, threshold, tam_bloque, workers)
+    return [items[con_texto[k]] for k in _indices_conservados(len(textos), pares)]
+
+
+def normalizar_vectores(vectores):
+    """Matriz float32 con cada fila de norma 1 (las filas nulas quedan a cero)"""
+    matriz = np.asarray(vectores, dtype=np.float32)
+    if matriz.ndim != 2:
+        matriz = matriz.reshape(len(matriz), -1)
+    normas = np.linalg.norm(matriz, axis=1, keepdims=True)
+    normas[normas == 0] = 1.0
+    return matriz / normas
+
+
+def pares_semanticos(vectores, umbral=0.90, tam_bloque=2048):
+    """
+    Pares (i, j), i < j, con similitud coseno >= umbral. Los vectores se
+    normalizan una vez y la similitud sale de productos de matrices por
+    bloques de tam_bloque × tam_bloque (solo el triángulo superior), así la
+    memoria no depende del tamaño del corpus. Orden igual que pares_similares.
+    """
+    if len(vectores) == 0:
+        return
+    matriz = normalizar_vectores(vectores)
+    n = len(matriz)
+    for i0 in range(0, n, tam_bloque):
+        filas = matriz[i0:i0 + tam_bloque]
+        pares = []
+        for j0 in range(i0, n, tam_bloque):
+            sims = filas @ matriz[j0:j0 + tam_bloque].T
+            ii, jj = np.nonzero(sims >= umbral)
+            ii = ii + i0
+            jj = jj + j0
+            arriba = jj > ii
+            pares.append(np.column_stack((ii[arriba], jj[arriba])))
+        bloque = np.concatenate(pares)
+        bloque = bloque[np.lexsort((bloque[:, 1], bloque[:, 0]))]
+        yield from map(tuple, bloque.tolist())
+
+
+def duplicados_semanticos(vectores, umbral=0.90, tam_bloque=2048):
+    """
+    Semántica greedy de deduplicar_semantico, pero devolviendo qué se descarta:
+    {índice conservado: [índices descartados por él]}. Cada descartado es >= umbral
+    de su conservado (sin cadenas A~B~C) y se asigna al primero con el que coincide.
+    El orden de `vectores` decide quién se conserva.
+    """
+    pares = list(pares_semanticos(vectores, umbral, tam_bloque))
+    conservados = set(_indices_conservados(len(vectores), pares))
+    duplicados = defaultdict(list)
+    asignados = set()
+    for i, j in pares:
+        if i in conservados and j not in conservados and j not in asignados:
+            asignados.add(j)
+            duplicados[i].append(j)
+    return dict(duplicados)
+
+
+def deduplicar_semantico(items, vectores, umbral=0.90, tam_bloque=2048):
+    """
+    Deduplicación semántica de `items` dados sus embeddings (misma posición).
+    Pensado para reutilizar los vectores que ya guarda Chroma en lugar de volver
+    a embeber. Semántica greedy, igual que deduplicar_fuzzy.
+    """
+    if len(items) != len(vectores):
+        raise ValueError(f"{len(items)} items pero {len(vectores)} vectores")
+    if not items:
+        return []
+    pares = pares_semanticos(vectores, umbral, tam_bloque)
+    return [items[i] for i in _indices_conservados(len(items), pares)]
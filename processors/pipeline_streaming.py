@@ -0,0 +1,225 @@
+# processors/pipeline_streaming.py
+import json
+import queue
+import threading
+import time
+from datetime import datetime
+
+_FIN = object()  # marca de fin de flujo que recorre todas las colas
+
+
+class PipelineStreaming:
+    """
+    Pipeline por etapas conectadas con colas acotadas, cada etapa en su propio hilo:
+
+        fuentes (scrapers) → etapa → etapa → ... → sumidero por lotes (p.ej. RAG)
+
+    Mientras las fuentes siguen descargando, las etapas ya filtran e indexan lo
+    que llegó: el tiempo total tiende al de la etapa más lenta y la memoria queda
+    acotada por el tamaño de las colas (una fuente se bloquea si la siguiente va lenta).
+    """
+
+    def __init__(self, tam_cola=500):
+        self.tam_cola = tam_cola
+        self._fuentes = []
+        self._etapas = []
+        self._sumidero = None
+        self.metricas = {}
+
+    def fuente(self, nombre, generador):
+        """
+        `generador()` produce lotes (listas) de items; cada fuente corre en su hilo
+        y todas alimentan la primera cola.
+        """
+        self._fuentes.append((nombre, generador))
+        return self
+
+    def etapa(self, nombre, funcion):
+        """`funcion(item)` devuelve el item (quizá modificado) o None para descartarlo"""
+        self._etapas.append((nombre, funcion))
+        return self
+
+    def sumidero(self, nombre, funcion_lote, tam_lote=256):
+        """`funcion_lote(items)` recibe los items supervivientes en lotes de `tam_lote`"""
+        self._sumidero = (nombre, funcion_lote, tam_lote)
+        return self
+
+    def ejecutar(self):
+        """Arranca todos los hilos, espera a que se vacíe el flujo y devuelve las métricas"""
+        inicio = time.monotonic()
+        colas = [queue.Queue(maxsize=self.tam_cola) for _ in range(len(self._etapas) + 1)]
+
+        hilos = []
+        fuentes_vivas = [len(self._fuentes)]
+        lock_fuentes = threading.Lock()
+
+        def cerrar_fuente():
+            with lock_fuentes:
+                fuentes_vivas[0] -= 1
+                if fuentes_vivas[0] == 0:
+                    colas[0].put(_FIN)
+
+        for nombre, generador in self._fuentes:
+            hilos.append(threading.Thread(
+                target=self._correr_fuente, args=(nombre, generador, colas[0], cerrar_fuente),
+                name=f"fuente-{nombre}", daemon=True
+            ))
+        if not self._fuentes:
+            colas[0].put(_FIN)
+
+        for i, (nombre, funcion) in enumerate(self._etapas):
+            hilos.append(threading.Thread(
+                target=self._correr_etapa, args=(nombre, funcion, colas[i], colas[i + 1]),
+                name=f"etapa-{nombre}", daemon=True
+            ))
+
+        if self._sumidero:
+            nombre, funcion_lote, tam_lote = self._sumidero
+            hilos.append(threading.Thread(
+                target=self._correr_sumidero, args=(nombre, funcion_lote, tam_lote, colas[-1]),
+                name=f"sumidero-{nombre}", daemon=True
+            ))
+        else:
+            hilos.append(threading.Thread(target=self._drenar, args=(colas[-1],), daemon=True))
+
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+
+        self.metricas['_total'] = {'segundos': round(time.monotonic() - inicio, 1)}
+        return self.metricas
+
+    def resumen(self):
+        print("\n⏱️ Métricas del pipeline:")
+        for nombre, m in self.metricas.items():
+            if nombre == '_total':
+                continue
+            print(f"   • {nombre}: entrada {m['entrada']}, salida {m['salida']}, "
+                  f"errores {m['errores']}, ocupado {m['segundos']:.1f}s")
+        print(f"   • Tiempo total: {self.metricas.get('_total', {}).get('segundos', 0)}s")
+
+    def _metrica(self, nombre):
+        self.metricas[nombre] = {'entrada': 0, 'salida': 0, 'errores': 0, 'segundos': 0.0}
+        return self.metricas[nombre]
+
+    def _correr_fuente(self, nombre, generador, salida, cerrar_fuente):
+        m = self._metrica(nombre)
+        try:
+            for lote in generador():
+                for item in lote or ():
+                    m['salida'] += 1
+                    salida.put(item)  # bloquea si la siguiente etapa va atrasada
+        except Exception as e:
+            m['errores'] += 1
+            print(f"❌ Fuente '{nombre}' falló: {e}")
+        finally:
+            cerrar_fuente()
+
+    def _correr_etapa(self, nombre, funcion, entrada, salida):
+        m = self._metrica(nombre)
+        while True:
+            item = entrada.get()
+            if item is _FIN:
+                salida.put(_FIN)
+                return
+            m['entrada'] += 1
+            t = time.monotonic()
+            try:
+                resultado = funcion(item)
+            except Exception as e:
+                m['errores'] += 1
+                print(f"⚠️ Etapa '{nombre}' descartó un item por error: {e}")
+                resultado = None
+            m['segundos'] += time.monotonic() - t
+            if resultado is not None:
+                m['salida'] += 1
+                salida.put(resultado)
+
+    def _correr_sumidero(self, nombre, funcion_lote, tam_lote, entrada):
+        m = self._metrica(nombre)
+        lote = []
+
+        def vaciar():
+            t = time.monotonic()
+            try:
+                funcion_lote(lote)
+                m['salida'] += len(lote)
+            except Exception as e:
+                m['errores'] += 1
+                print(f"❌ Sumidero '{nombre}' falló con un lote de {len(lote)}: {e}")
+            m['segundos'] += time.monotonic() - t
+
+        while True:
+            item = entrada.get()
+            if item is _FIN:
+                break
+            m['entrada'] += 1
+            lote.append(item)
+            if len(lote) >= tam_lote:
+                vaciar()
+                lote = []
+        if lote:
+            vaciar()
+
+    def _drenar(self, entrada):
+        while entrada.get() is not _FIN:
+            pass
+
+
+class VolcadoCrudos:
+    """
+    Escribe los datos scrapeados a disco a medida que llegan (JSON + TXT legible),
+    sin acumular la lista completa en memoria.
+    """
+
+    def __init__(self, json_path, txt_path):
+        self.json_path = json_path
+        self.txt_path = txt_path
+        self.total = 0
+        self._lock = threading.Lock()
+
+        self._json = open(json_path, "w", encoding="utf-8")
+        self._json.write("[\n")
+
+        self._txt = open(txt_path, "w", encoding="utf-8")
+        self._txt.write(f"ARCHIVO DE DATOS SCRAPEADOS - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+        self._txt.write("=" * 80 + "\n\n")
+
+    def escribir(self, item):
+        with self._lock:
+            self.total += 1
+            if self.total > 1:
+                self._json.write(",\n")
+            self._json.write(json.dumps(item, ensure_ascii=False, indent=2, default=str))
+            self._escribir_txt(self.total, item)
+
+    def _escribir_txt(self, i, item):
+        f = self._txt
+        f.write(f"┌─── ELEMENTO #{i} ───────────────────────────────────────┐\n")
+
+        # Texto principal (el más importante)
+        texto = item.get("texto") or item.get("contenido") or item.get("text") or "(sin texto)"
+        f.write(f"TEXTO:\n{texto}\n\n")
+
+        # Metadatos clave
+        campos_interesantes = [
+            ("Plataforma", item.get("plataforma") or item.get("source") or "—"),
+            ("URL", item.get("url") or item.get("video_url") or "—"),
+            ("Autor", item.get("autor") or item.get("author") or item.get("username") or "—"),
+            ("Fecha", item.get("fecha") or item.get("date") or item.get("published_at") or "—"),
+            ("Tipo", item.get("tipo") or "—")
+        ]
+
+        for nombre, valor in campos_interesantes:
+            if valor and valor != "—":
+                f.write(f"{nombre:12}: {valor}\n")
+
+        f.write("└────────────────────────────────────────────────────────────┘\n\n")
+
+    def cerrar(self):
+        with self._lock:
+            self._json.write("\n]\n")
+            self._json.close()
+            self._txt.write(f"Total elementos scrapeados: {self.total}\n")
+            self._txt.close()
@@ -1,10 +1,14 @@
 # rag_manager.py (versión mejorada)
 from langchain_chroma import Chroma
+from langchain_core.documents import Document
 from langchain_huggingface import HuggingFaceEmbeddings
 from datetime import datetime
 from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+import numpy as np
 import os
 
+from processors.deduplicacion import duplicados_semanticos
+
 analyzer = SentimentIntensityAnalyzer() 
 
 class RAGManager:
@@ -132,6 +136,67 @@ class RAGManager:
         results = self.vectorstore.similarity_search(query, k=k)
         return results
 
+    def buscar_con_embeddings(self, query, k=50):
+        """
+        Como buscar_relevantes, pero en una sola consulta a Chroma devuelve también
+        los vectores guardados de cada resultado: (docs, vectores, distancias).
+        `docs` son Document con id, texto y metadatos; `vectores` es una matriz
+        (len(docs) × dim) en el mismo orden, lista para dedup / clustering / MMR
+        sin volver a embeber. Solo se embebe la query.
+        """
+        resultado = self.vectorstore._collection.query(
+            query_embeddings=[self.embeddings.embed_query(query)],
+            n_results=k,
+            include=["documents", "metadatas", "embeddings", "distances"]
+        )
+        ids = resultado["ids"][0]
+        textos = resultado["documents"][0]
+        metadatas = resultado["metadatas"][0]
+        docs = [
+            Document(id=id_doc, page_content=texto or "", metadata=meta or {})
+            for id_doc, texto, meta in zip(ids, textos, metadatas)
+        ]
+        vectores = np.asarray(resultado["embeddings"][0], dtype=np.float32)
+        return docs, vectores, list(resultado["distances"][0])
+
+    def deduplicar_corpus(self, umbral=0.90, eliminar=False, tam_bloque=2048):
+        """
+        Busca casi-duplicados semánticos (coseno >= umbral) en TODA la base con los
+        embeddings almacenados. Greedy, como en analizar_con_ollama: recorriendo por
+        `fecha_agregado` (lo más antiguo primero), cada documento conservado descarta
+        a los posteriores que se le parecen; solo se descarta lo que es >= umbral de
+        un conservado (sin cadenas A~B~C).
+        Por defecto solo informa; con eliminar=True los duplicados se BORRAN de la
+        colección persistida. Devuelve {id conservado: [ids duplicados]}.
+        """
+        todos = self.vectorstore._collection.get(include=["embeddings", "metadatas"])
+        ids = todos["ids"]
+        if not ids:
+            print("⚠️ Base vacía: nada que deduplicar")
+            return {}
+
+        # Chroma no garantiza el orden de get(): se ordena por fecha de alta (y id para desempatar)
+        orden = sorted(
+            range(len(ids)),
+            key=lambda i: ((todos["metadatas"][i] or {}).get("fecha_agregado", ""), ids[i])
+        )
+        vectores = np.asarray(todos["embeddings"], dtype=np.float32)[orden]
+        duplicados = {
+            ids[orden[conservado]]: [ids[orden[d]] for d in descartados]
+            for conservado, descartados in
+            duplicados_semanticos(vectores, umbral=umbral, tam_bloque=tam_bloque).items()
+        }
+        total_duplicados = sum(len(d) for d in duplicados.values())
+        print(f"🔁 Dedup semántica del corpus (>= {umbral}): {len(ids)} documentos, "
+              f"{total_duplicados} duplicados de {len(duplicados)} documentos conservados")
+
+        if eliminar and total_duplicados:
+            a_borrar = [i for d in duplicados.values() for i in d]
+            for inicio in range(0, len(a_borrar), 1000):
+                self.vectorstore._collection.delete(ids=a_borrar[inicio:inicio + 1000])
+            print(f"   🗑️ Eliminados {total_duplicados}. Total en RAG: {self.get_total_documents()}")
+        return duplicados
+
     def limpiar_base(self):
         self.vectorstore.delete_collection()
         print("✅ Base RAG limpiada completamente")
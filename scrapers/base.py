@@ -14,11 +14,44 @@ class BaseScraper(ABC):
         pass
     
     @abstractmethod
-    def scrape(self, url):
-        """Método principal de scraping"""
+    def scrape(self, url, soup=None):
+        """Método principal de scraping (soup: documento ya parseado, opcional)"""
         pass
     
     def extraer_dominio(self, url):
         """Extrae el dominio de una URL"""
         parsed = urllib.parse.urlparse(url)
-        return parsed.netloc.replace('www.', '')
\ No newline at end of file
+        return parsed.netloc.replace('www.', '')
+
+
+class ResultadoEstrategia:
+    """
+    Resultado de una estrategia de scraping sobre una página, con su calidad
+    para que el orquestador elija sin repetir descargas ni parseos.
+    `suficiente` = al menos `objetivo` elementos y alguno con más de `min_chars`
+    (umbral propio de cada estrategia para cortar antes).
+    `calidad` se mide siempre con la misma escala (OBJETIVO_CALIDAD / MIN_CHARS_CALIDAD)
+    para que las estrategias sean comparables entre sí.
+    """
+    
+    OBJETIVO_CALIDAD = 10
+    MIN_CHARS_CALIDAD = 80
+    
+    def __init__(self, estrategia, datos, objetivo=10, min_chars=80):
+        self.estrategia = estrategia
+        self.datos = datos or []
+        self.objetivo = objetivo
+        self.min_chars = min_chars
+        
+        utiles = sum(1 for d in self.datos if len(d.get('contenido', '')) > min_chars)
+        self.suficiente = len(self.datos) >= objetivo and utiles > 0
+        # 0..1: cobertura respecto al objetivo común + proporción de elementos con texto útil
+        if self.datos:
+            utiles_comunes = sum(1 for d in self.datos if len(d.get('contenido', '')) > self.MIN_CHARS_CALIDAD)
+            cobertura = min(1.0, len(self.datos) / self.OBJETIVO_CALIDAD)
+            self.calidad = round(0.6 * cobertura + 0.4 * utiles_comunes / len(self.datos), 3)
+        else:
+            self.calidad = 0.0
+    
+    def __repr__(self):
+        return f"ResultadoEstrategia({self.estrategia}, {len(self.datos)} elementos, calidad={self.calidad})"
\ No newline at end of file
@@ -0,0 +1,71 @@
+# scrapers/indice_dominios.py
+from urllib.parse import urlparse
+
+_PATRONES = None  # clave reservada del nodo: las etiquetas de dominio siempre son str
+
+
+class IndiceDominios:
+    """
+    Trie de etiquetas de dominio invertidas (com → macrumors → forums) construido
+    una vez con las claves de config/patrones.json.
+    Resuelve una URL en O(nº de etiquetas) con precedencia determinista:
+      1. el sufijo de dominio registrado más largo (forums.macrumors.com gana a macrumors.com)
+      2. dentro del mismo dominio, el prefijo de ruta más largo ("sitio.com/foro" gana a "sitio.com")
+    Las resoluciones por host se cachean.
+    """
+
+    def __init__(self, claves=()):
+        self._raiz = {}
+        self._cache = {}
+        self._total = 0
+        for clave in claves:
+            self.agregar(clave)
+
+    def agregar(self, clave):
+        """Registra una clave 'dominio' o 'dominio/ruta'"""
+        host, _, ruta = clave.lower().partition('/')
+        nodo = self._raiz
+        for etiqueta in reversed(self._limpiar_host(host).split('.')):
+            nodo = nodo.setdefault(etiqueta, {})
+
+        candidatos = nodo.setdefault(_PATRONES, [])
+        candidatos.append(('/' + ruta if ruta else '', clave))
+        # Ruta más larga primero; a igual longitud, orden alfabético de la clave
+        candidatos.sort(key=lambda c: (-len(c[0]), c[1]))
+        self._total += 1
+        self._cache.clear()
+
+    def resolver(self, url):
+        """Clave del patrón que corresponde a la URL, o None"""
+        parsed = urlparse(url if '//' in url else '//' + url)
+        host = self._limpiar_host(parsed.hostname or '')
+        ruta = (parsed.path or '/').lower()
+
+        candidatos = self._cache.get(host)
+        if candidatos is None:
+            candidatos = self._candidatos(host)
+            self._cache[host] = candidatos
+
+        for prefijo, clave in candidatos:
+            if ruta.startswith(prefijo):
+                return clave
+        return None
+
+    def _candidatos(self, host):
+        """Candidatos de todos los sufijos registrados del host, del más largo al más corto"""
+        encontrados = []
+        nodo = self._raiz
+        for etiqueta in reversed(host.split('.')):
+            nodo = nodo.get(etiqueta)
+            if nodo is None:
+                break
+            if _PATRONES in nodo:
+                encontrados.append(nodo[_PATRONES])
+        return [c for nivel in reversed(encontrados) for c in nivel]
+
+    def _limpiar_host(self, host):
+        host = host.lower().strip('.')
+        return host[4:] if host.startswith('www.') else host
+
+    def __len__(self):
+        return self._total
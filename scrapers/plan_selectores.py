@@ -0,0 +1,71 @@
+# scrapers/plan_selectores.py
+import soupsieve as sv
+
+
+class PatronInvalido(ValueError):
+    """El patrón de config/patrones.json no se puede compilar"""
+    pass
+
+
+class PlanSelectores:
+    """
+    Patrón de config/patrones.json validado y compilado una sola vez al cargar.
+    Los selectores CSS quedan precompilados con soupsieve, así el bucle de
+    extracción no vuelve a parsear cadenas como ".entry-excerpt, .post-excerpt, p".
+    """
+
+    # Orden fijo de extracción de campos
+    CAMPOS = ('titulo', 'texto', 'contenido', 'autor', 'fecha')
+    # Campos de los que se quieren todos los elementos (el resto solo el primero)
+    CAMPOS_MULTIPLES = ('texto', 'contenido')
+    # Cadena de respaldo para el texto: si el primero no da suficiente, el siguiente
+    CADENA_TEXTO = ('texto', 'contenido')
+
+    def __init__(self, nombre, patron):
+        if not isinstance(patron, dict):
+            raise PatronInvalido("el patrón debe ser un objeto JSON")
+        selectores = patron.get('selectores', {})
+        if not isinstance(selectores, dict):
+            raise PatronInvalido("'selectores' debe ser un objeto JSON")
+
+        self.nombre = nombre
+        self.tipo = patron.get('tipo', 'desconocido')
+        self.marca = patron.get('marca')
+        self.selectores = selectores  # cadenas originales, para diagnóstico
+
+        self.contenedor = self._compilar('contenedor', selectores.get('contenedor', 'body'))
+        self.campos = []  # [(clave, matcher, multiple)] en el orden de CAMPOS
+        for clave in self.CAMPOS:
+            if clave in selectores:
+                self.campos.append((clave, self._compilar(clave, selectores[clave]), clave in self.CAMPOS_MULTIPLES))
+
+        self.ignorados = [c for c in selectores if c != 'contenedor' and c not in self.CAMPOS]
+
+    def contenedores(self, soup):
+        """Todos los contenedores del documento"""
+        return self.contenedor.select(soup)
+
+    def extraer_campos(self, contenedor):
+        """
+        Una pasada por los selectores del plan: {clave: [elementos]}.
+        Los campos simples devuelven como mucho un elemento.
+        """
+        encontrados = {}
+        for clave, matcher, multiple in self.campos:
+            if multiple:
+                encontrados[clave] = matcher.select(contenedor)
+            else:
+                elem = matcher.select_one(contenedor)
+                encontrados[clave] = [elem] if elem is not None else []
+        return encontrados
+
+    def _compilar(self, clave, selector):
+        if not isinstance(selector, str) or not selector.strip():
+            raise PatronInvalido(f"selector '{clave}' vacío o no es texto")
+        try:
+            return sv.compile(selector)
+        except sv.SelectorSyntaxError as e:
+            raise PatronInvalido(f"selector '{clave}' inválido ({selector!r}): {e}") from e
+
+    def __repr__(self):
+        return f"PlanSelectores({self.nombre}, campos={[c for c, _, _ in self.campos]})"
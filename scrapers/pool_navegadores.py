@@ -0,0 +1,100 @@
+# scrapers/pool_navegadores.py
+import queue
+import threading
+
+from .scraper_selenium import ScraperSelenium
+
+
+class PoolNavegadores:
+    """
+    Pool de hasta `tamano` navegadores headless (ScraperSelenium) que se reutilizan
+    entre páginas: arrancar un driver cuesta segundos, así que se crean bajo demanda
+    una sola vez y quedan calientes para los siguientes scrapes.
+    Es thread-safe: cada hilo toma un navegador libre y lo devuelve al terminar.
+    Un navegador cuyo driver murió no se devuelve: se cierra y el siguiente
+    trabajo arranca uno nuevo.
+    """
+
+    def __init__(self, tamano=2, navegador="edge", headless=True, **kwargs_selenium):
+        self.tamano = tamano
+        self.navegador = navegador
+        self.headless = headless
+        self.kwargs_selenium = kwargs_selenium
+
+        self._libres = queue.Queue()
+        self._todos = []
+        self._lock = threading.Lock()
+
+    def calentar(self, n=None):
+        """Arranca ya `n` navegadores (por defecto todos) para no pagar el arranque luego"""
+        for _ in range(min(n or self.tamano, self.tamano) - len(self._todos)):
+            scraper = self._crear()
+            if scraper is None:
+                break
+            self._libres.put(scraper)
+
+    def scrape(self, url, max_items=25, selector_espera=None):
+        """Scrapea una URL con el primer navegador libre (bloquea si están todos ocupados)"""
+        scraper = self._tomar()
+        sano = False
+        try:
+            resultado = scraper.scrape(url, max_items=max_items, selector_espera=selector_espera)
+            sano = scraper.sano
+            return resultado
+        finally:
+            if sano:
+                self._libres.put(scraper)
+            else:
+                self._descartar(scraper)
+
+    def cerrar(self):
+        with self._lock:
+            for scraper in self._todos:
+                if scraper is not None:
+                    scraper.cerrar()
+            self._todos = []
+            self._libres = queue.Queue()
+
+    def _descartar(self, scraper):
+        """Cierra un navegador roto y libera su hueco en el pool"""
+        print(f"   ♻️ Navegador {self.navegador} descartado (driver caído); se creará otro si hace falta")
+        scraper.cerrar()
+        with self._lock:
+            if scraper in self._todos:
+                self._todos.remove(scraper)
+
+    def _tomar(self):
+        try:
+            return self._libres.get_nowait()
+        except queue.Empty:
+            pass
+        while True:
+            scraper = self._crear()
+            if scraper is not None:
+                return scraper
+            # Pool lleno: esperar a que otro hilo devuelva su navegador (o descarte uno roto)
+            try:
+                return self._libres.get(timeout=1)
+            except queue.Empty:
+                pass
+
+    def _crear(self):
+        """Crea un navegador nuevo si no se ha llegado al tamaño del pool (None si está lleno)"""
+        with self._lock:
+            if len(self._todos) >= self.tamano:
+                return None
+            # Se reserva el hueco antes de arrancar el driver (que tarda) para no pasarse
+            self._todos.append(None)
+        try:
+            print(f"   Inicializando navegador {self.navegador} ({len(self._todos)}/{self.tamano})...")
+            scraper = ScraperSelenium(headless=self.headless, navegador=self.navegador, **self.kwargs_selenium)
+        except Exception:
+            with self._lock:
+                self._todos.remove(None)
+            raise
+        with self._lock:
+            self._todos[self._todos.index(None)] = scraper
+        return scraper
+
+    def __len__(self):
+        return len(self._todos)
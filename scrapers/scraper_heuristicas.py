@@ -1,8 +1,16 @@
 # scrapers/scraper_heuristicas.py
 from .base import BaseScraper
-from bs4 import BeautifulSoup
+from utils.parseo import parsear_html, RE_AUTOR, RE_FECHA, TAGS_TITULO
 import re
 
+RE_CONTENEDOR = re.compile(r'post|content|main|entry|blog|forum', re.I)
+RE_COMENTARIO = re.compile(r'comment|reply|response', re.I)
+MAX_DENSIDAD_ENLACES = 0.6
+# Un autor/fecha es un marcador pequeño: sin hijos de bloque y con poco texto
+TAGS_BLOQUE = ['p', 'div', 'section', 'article', 'ul', 'ol', 'table', 'blockquote', 'pre',
+               'h1', 'h2', 'h3', 'h4', 'h5', 'h6']
+MAX_CHARS_MARCADOR = 120
+
 class HeuristicasBasicas(BaseScraper):
     """
     Scraper que usa heurísticas para sitios no configurados
@@ -19,38 +27,31 @@ class HeuristicasBasicas(BaseScraper):
         """
         return True  # Las heurísticas pueden intentar con cualquier sitio
     
-    def scrape(self, url):
+    def scrape(self, url, soup=None):
         """
         ✅ IMPLEMENTACIÓN DEL MÉTODO ABSTRACTO REQUERIDO
-        Extrae datos usando heurísticas inteligentes
+        Extrae datos usando heurísticas inteligentes.
+        Si se pasa `soup` (ya parseado por el orquestador) no se descarga ni se re-parsea.
         """
         print(f"🔍 Usando heurísticas para: {url}")
         
-        # Descargar página
-        html = self.descargador.descargar(url)
-        if not html:
-            return []
-        
-        soup = BeautifulSoup(html, 'html.parser')
+        # Descargar y parsear solo si no nos dieron el documento
+        if soup is None:
+            html = self.descargador.descargar(url)
+            if not html:
+                return []
+            soup = parsear_html(html)
         
         datos_extraidos = []
         
         try:
-            # Heurística 1: Buscar artículos
-            for articulo in soup.find_all(['article', 'div', 'section']):
-                item = self._extraer_de_elemento(articulo, url)
+            # Heurística 1+2: una sola pasada por el árbol; cada párrafo va a su bloque más cercano
+            tipo_url = self._inferir_tipo_url(url)
+            for bloque in self._bloques_candidatos(soup):
+                item = self._item_de_bloque(bloque, url, tipo_url)
                 if item:
                     datos_extraidos.append(item)
             
-            # Heurística 2: Si no hay artículos, buscar contenedores con clase
-            if not datos_extraidos:
-                clases_comunes = ['post', 'content', 'main', 'entry', 'blog', 'forum']
-                for clase in clases_comunes:
-                    for elem in soup.find_all(class_=re.compile(clase, re.I)):
-                        item = self._extraer_de_elemento(elem, url)
-                        if item:
-                            datos_extraidos.append(item)
-            
             # Heurística 3: Extraer al menos el título de la página
             if not datos_extraidos:
                 titulo = soup.title
@@ -68,48 +69,118 @@ class HeuristicasBasicas(BaseScraper):
         print(f"📊 Heurísticas extrajeron {len(datos_extraidos)} elementos")
         return datos_extraidos
     
-    def _extraer_de_elemento(self, elemento, url):
-        """Intenta extraer datos de un elemento HTML"""
-        try:
-            item = {}
+    def _bloques_candidatos(self, soup):
+        """
+        Recorrido DFS iterativo (lineal) que reparte el contenido en bloques candidatos.
+        Cada nodo lleva consigo el bloque más cercano: los párrafos, títulos, autor y fecha
+        se asignan a ese bloque una sola vez (sin re-recorrer subárboles por cada ancestro).
+        - <article> siempre abre bloque (un post).
+        - <div>/<section> o elementos con clase de contenido abren bloque salvo dentro de un
+          <article> o cuando el bloque actual ya tiene título y aún no tiene texto (es su cuerpo).
+        """
+        bloques = []
+        pila = [(soup, None)]
+        
+        while pila:
+            elemento, bloque = pila.pop()
+            nombre = elemento.name
             
-            # Buscar título
-            titulos = elemento.find_all(['h1', 'h2', 'h3', 'h4'])
-            if titulos:
-                item['titulo'] = titulos[0].get_text(strip=True)
+            if nombre in TAGS_TITULO:
+                if bloque is not None and bloque['titulo'] is None:
+                    bloque['titulo'] = elemento.get_text(strip=True)
+                continue
             
-            # Buscar contenido
-            parrafos = elemento.find_all('p')
-            if parrafos:
-                texto = ' '.join([p.get_text(strip=True) for p in parrafos[:3]])
-                if texto:
-                    item['texto'] = texto
+            if nombre == 'p':
+                if bloque is not None:
+                    texto = elemento.get_text(strip=True)
+                    if texto:
+                        bloque['parrafos'].append(texto)
+                        bloque['chars'] += len(texto)
+                        bloque['chars_enlace'] += sum(len(a.get_text(strip=True)) for a in elemento.find_all('a'))
+                continue
             
-            # Buscar autor
-            autor_elem = elemento.find(class_=re.compile('author|byline|writer', re.I))
-            if autor_elem:
-                item['autor'] = autor_elem.get_text(strip=True)
+            clases = ' '.join(elemento.get('class') or ()) if nombre != '[document]' else ''
             
-            # Buscar fecha
-            fecha_elem = elemento.find(class_=re.compile('date|time|posted', re.I))
-            if fecha_elem:
-                item['fecha'] = fecha_elem.get_text(strip=True)
+            # Autor y fecha son hojas del bloque actual si son marcadores pequeños; clases
+            # amplias (timeline, posted-content, author-box) que envuelven el cuerpo del
+            # post no cuentan y se sigue bajando por ellas
+            if bloque is not None and clases:
+                campo = None
+                if bloque['autor'] is None and RE_AUTOR.search(clases):
+                    campo = 'autor'
+                elif bloque['fecha'] is None and RE_FECHA.search(clases):
+                    campo = 'fecha'
+                if campo:
+                    texto = self._texto_marcador(elemento)
+                    if texto is not None:
+                        bloque[campo] = texto
+                        continue
             
-            # Validar que tenga contenido
-            if item.get('titulo') or item.get('texto'):
-                item['url_fuente'] = url
-                item['tipo_fuente'] = self._inferir_tipo(url, elemento)
-                return item
+            if self._abre_bloque(nombre, clases, bloque):
+                bloque = {
+                    'elemento': elemento, 'titulo': None, 'parrafos': [], 'chars': 0,
+                    'chars_enlace': 0, 'autor': None, 'fecha': None,
+                    'comentario': False, 'es_articulo': nombre == 'article'
+                }
+                bloques.append(bloque)
             
-        except Exception as e:
-            print(f"⚠️ Error extrayendo elemento: {e}")
+            if bloque is not None and (clases or elemento.get('id')):
+                if RE_COMENTARIO.search(f"{clases} {elemento.get('id', '')}"):
+                    bloque['comentario'] = True
+            
+            # Hijos en orden inverso para procesarlos en orden de documento
+            hijos = [h for h in elemento.contents if getattr(h, 'name', None)]
+            for hijo in reversed(hijos):
+                pila.append((hijo, bloque))
         
-        return None
+        return bloques
+    
+    def _texto_marcador(self, elemento):
+        """Texto del elemento si es un marcador de autor/fecha (pequeño, sin bloques dentro), o None"""
+        if elemento.find(TAGS_BLOQUE) is not None:
+            return None
+        texto = elemento.get_text(strip=True)
+        return texto if len(texto) <= MAX_CHARS_MARCADOR else None
+    
+    def _abre_bloque(self, nombre, clases, bloque):
+        if nombre == 'article':
+            return True
+        if nombre not in ('div', 'section') and not (clases and RE_CONTENEDOR.search(clases)):
+            return False
+        if bloque is None:
+            return True
+        if bloque['es_articulo']:
+            return False
+        # Envoltorio del cuerpo de un bloque que ya tiene título
+        return not (bloque['titulo'] and not bloque['parrafos'])
     
-    def _inferir_tipo(self, url, elemento):
-        """Infiere el tipo de contenido"""
+    def _item_de_bloque(self, bloque, url, tipo_url):
+        """Convierte un bloque en item si su contenido es útil (descarta bloques de enlaces)"""
+        item = {}
+        if bloque['titulo']:
+            item['titulo'] = bloque['titulo']
+        
+        if bloque['parrafos']:
+            # Densidad de enlaces: párrafos que son casi solo links (menús, pies) no son contenido
+            densidad_enlaces = bloque['chars_enlace'] / max(bloque['chars'], 1)
+            if densidad_enlaces <= MAX_DENSIDAD_ENLACES:
+                item['texto'] = ' '.join(bloque['parrafos'])[:3000]
+        
+        if not (item.get('titulo') or item.get('texto')):
+            return None
+        
+        if bloque['autor']:
+            item['autor'] = bloque['autor']
+        if bloque['fecha']:
+            item['fecha'] = bloque['fecha']
+        
+        item['url_fuente'] = url
+        item['tipo_fuente'] = tipo_url or ('comentario' if bloque['comentario'] else 'pagina_web')
+        return item
+    
+    def _inferir_tipo_url(self, url):
+        """Infiere el tipo de contenido a partir de la URL (None si no dice nada)"""
         url_lower = url.lower()
-        elemento_str = str(elemento).lower()
         
         if any(word in url_lower for word in ['foro', 'forum', 'board', 'discussion']):
             return 'foro'
@@ -117,7 +188,5 @@ class HeuristicasBasicas(BaseScraper):
             return 'blog'
         elif any(word in url_lower for word in ['news', 'noticia', 'report']):
             return 'noticia'
-        elif any(word in elemento_str for word in ['comment', 'reply', 'response']):
-            return 'comentario'
         
-        return 'pagina_web'
\ No newline at end of file
+        return None
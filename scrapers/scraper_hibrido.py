@@ -3,9 +3,11 @@ from .scraper_patrones import ScraperConPatrones
 from .scraper_heuristicas import HeuristicasBasicas
 from detectors.detector_tipo import DetectorTipoPagina
 from processors.normalizador import NormalizadorMVP
-from .scraper_selenium import ScraperSelenium
+from .pool_navegadores import PoolNavegadores
+from .base import ResultadoEstrategia
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import threading
 import urllib.parse
-from .scraper_selenium import ScraperSelenium
 
 class ScraperHibrido:
     """
@@ -13,80 +15,134 @@ class ScraperHibrido:
     Decide automáticamente qué estrategia usar
     """
     
-    def __init__(self, descargador, normalizador=None):
+    def __init__(self, descargador, normalizador=None, debug=False, navegadores=2, navegador="edge"):
         self.descargador = descargador
-        self.scraper_selenium = None
-        self.scraper_patrones = ScraperConPatrones(descargador)
+        # Pool de navegadores headless para el fallback JS (se crea al primer uso)
+        self.pool_selenium = None
+        self.navegadores = navegadores
+        self.navegador = navegador
+        self._lock_pool = threading.Lock()
+        self._selenium_disponible = True  # False si no se pudo arrancar ningún navegador
+        self.scraper_patrones = ScraperConPatrones(descargador, debug=debug)
         self.scraper_heuristicas = HeuristicasBasicas(descargador)
         self.detector = DetectorTipoPagina()
         self.normalizador = normalizador or NormalizadorMVP()
     
     def scrape(self, url):
             """
-            Flujo principal de scraping híbrido + Selenium fallback
+            Flujo principal de scraping híbrido + Selenium fallback.
+            La página se descarga y parsea UNA vez (DocumentoPagina); cada estrategia
+            devuelve un ResultadoEstrategia y se elige el de mejor calidad.
             """
             print(f"\n🔍 Iniciando scraping de: {url}")
             
-            datos_normalizados = []
+            resultados = []
+            clave_patron = None
+            documento = self.descargador.obtener_documento(url)
             
-            # PASO 1: Intentar con patrones conocidos (más rápido)
-            if self.scraper_patrones.puede_manejar(url):
-                print("✅ Usando estrategia: PATRÓN CONOCIDO")
-                datos_crudos = self.scraper_patrones.scrape(url)
-                tipo_fuente = self._obtener_tipo_patron(url)
+            if documento is not None:
+                # PASO 1: Intentar con patrones conocidos (más rápido); el patrón se resuelve una vez
+                clave_patron = self.scraper_patrones.resolver_patron(url)
+                if clave_patron is not None:
+                    print("✅ Usando estrategia: PATRÓN CONOCIDO")
+                    resultado = self._estrategia_patrones(documento, clave_patron)
+                    resultados.append(resultado)
+                    if resultado.suficiente:
+                        return resultado.datos
                 
-                if datos_crudos:
-                    datos_normalizados = self.normalizador.normalizar(datos_crudos, tipo_fuente, url)
-                    print(f"   ✅ Patrones extrajeron {len(datos_normalizados)} elementos normalizados")
-                    
-                    # Si sacó al menos 8 elementos con texto decente → éxito, retornamos
-                    if len(datos_normalizados) >= 20 and any(len(d.get('contenido', '')) > 100 for d in datos_normalizados):
-                        return datos_normalizados
-            
-            # PASO 2: Si patrones fallaron o dieron poco → heurísticas con BeautifulSoup
-            print("🔄 Usando estrategia: HEURÍSTICAS BS4")
-            datos_crudos = self.scraper_heuristicas.scrape(url)
-            tipo_fuente = self._inferir_tipo_fuente(url, datos_crudos or [])
-            
-            if datos_crudos:
-                datos_normalizados = self.normalizador.normalizar(datos_crudos, tipo_fuente, url)
-                print(f"   ✅ Heurísticas extrajeron {len(datos_normalizados)} elementos normalizados")
+                # PASO 2: Si patrones fallaron o dieron poco → el detector decide si vale la pena
+                # aplicar heurísticas sobre el mismo árbol o si la página es un shell de JS
+                deteccion = self.detector.analizar(documento)
+                print(f"🧭 Tipo detectado: {deteccion['tipo']} (scores: {deteccion['scores']})")
                 
-                # Si sacó buen contenido → éxito
-                if len(datos_normalizados) >= 10 and any(len(d.get('contenido', '')) > 80 for d in datos_normalizados):
-                    return datos_normalizados
+                if deteccion['necesita_js']:
+                    print("   ⏭️ Página renderizada por JavaScript: se omiten heurísticas")
+                else:
+                    print("🔄 Usando estrategia: HEURÍSTICAS BS4")
+                    resultado = self._estrategia_heuristicas(documento)
+                    resultados.append(resultado)
+                    if resultado.suficiente:
+                        return resultado.datos
             
-            # PASO 3: Fallback final → Selenium (para JS dinámico)
+            # PASO 3: Fallback final → Selenium (para JS dinámico; necesita su propia carga)
             print("🚀 Activando fallback: SELENIUM (carga JavaScript completo)")
-            if self.scraper_selenium is None:
-                print("   Inicializando driver de Chrome...")
-                self.scraper_selenium = ScraperSelenium(headless=True)
-            
-            datos_crudos_selenium = self.scraper_selenium.scrape(url, max_items=25)
-            
-            if datos_crudos_selenium:
-                # Usamos tipo genérico o inferido
-                tipo_fuente = 'dinamico_js'
-                datos_normalizados = self.normalizador.normalizar(datos_crudos_selenium, tipo_fuente, url)
-                print(f"   ✅ Selenium extrajo {len(datos_normalizados)} elementos ricos")
-                return datos_normalizados
-            else:
+            resultado = self._estrategia_selenium(url, clave_patron)
+            resultados.append(resultado)
+            if not resultado.datos:
                 print("   ⚠️ Selenium tampoco pudo extraer datos útiles")
             
-            # Si todo falló
+            # Ninguna fue suficiente: nos quedamos con la de mayor calidad
+            mejor = max(resultados, key=lambda r: r.calidad)
+            if mejor.datos:
+                print(f"   🏁 Mejor estrategia: {mejor.estrategia} (calidad {mejor.calidad})")
+                return mejor.datos
+            
             print("❌ No se pudieron extraer datos útiles de ningún método")
             return []
     
-    def _obtener_tipo_patron(self, url):
+    def _estrategia_patrones(self, documento, clave_patron):
+        datos_crudos = self.scraper_patrones.scrape(documento.url, clave_patron=clave_patron, documento=documento)
+        datos = []
+        if datos_crudos:
+            tipo_fuente = self._obtener_tipo_patron(documento.url, clave_patron)
+            datos = self.normalizador.normalizar(datos_crudos, tipo_fuente, documento.url)
+            print(f"   ✅ Patrones extrajeron {len(datos)} elementos normalizados")
+        return ResultadoEstrategia('patrones', datos, objetivo=20, min_chars=100)
+    
+    def _estrategia_heuristicas(self, documento):
+        datos_crudos = self.scraper_heuristicas.scrape(documento.url, soup=documento.soup)
+        datos = []
+        if datos_crudos:
+            tipo_fuente = self._inferir_tipo_fuente(documento.url, datos_crudos, documento.deteccion)
+            datos = self.normalizador.normalizar(datos_crudos, tipo_fuente, documento.url)
+            print(f"   ✅ Heurísticas extrajeron {len(datos)} elementos normalizados")
+        return ResultadoEstrategia('heuristicas', datos, objetivo=10, min_chars=80)
+    
+    def _estrategia_selenium(self, url, clave_patron=None):
+        if not self._selenium_disponible:
+            return ResultadoEstrategia('selenium', [], objetivo=1, min_chars=0)
+        with self._lock_pool:
+            if not self._selenium_disponible:
+                return ResultadoEstrategia('selenium', [], objetivo=1, min_chars=0)
+            if self.pool_selenium is None:
+                self.pool_selenium = PoolNavegadores(tamano=self.navegadores, navegador=self.navegador, headless=True)
+                # El primer navegador se arranca aquí, bajo el lock: si no hay driver se
+                # descubre una vez y no en cada hilo que llegue a Selenium a la vez
+                try:
+                    self.pool_selenium.calentar(1)
+                except Exception as e:
+                    print(f"   ❌ No se pudo arrancar Selenium: {e}")
+                    self._selenium_disponible = False
+                    return ResultadoEstrategia('selenium', [], objetivo=1, min_chars=0)
+        
+        # Con patrón conocido se espera a que aparezcan sus contenedores en vez de a ciegas
+        selector_espera = None
+        if clave_patron is not None:
+            selector_espera = self.scraper_patrones.patrones[clave_patron].get('selectores', {}).get('contenedor')
+        
+        try:
+            datos_crudos = self.pool_selenium.scrape(url, max_items=25, selector_espera=selector_espera)
+        except Exception as e:
+            # Sin navegador (driver no encontrado, etc.): se sigue con lo que dieron las otras estrategias
+            print(f"   ❌ No se pudo usar Selenium: {e}")
+            if not len(self.pool_selenium):
+                self._selenium_disponible = False
+            datos_crudos = []
+        datos = []
+        if datos_crudos:
+            datos = self.normalizador.normalizar(datos_crudos, 'dinamico_js', url)
+            print(f"   ✅ Selenium extrajo {len(datos)} elementos ricos")
+        return ResultadoEstrategia('selenium', datos, objetivo=1, min_chars=0)
+    
+    def _obtener_tipo_patron(self, url, clave_patron=None):
         """Obtiene el tipo de fuente desde los patrones configurados"""
-        dominio = self.extraer_dominio(url)
-        if hasattr(self.scraper_patrones, 'patrones') and dominio in self.scraper_patrones.patrones:
-            return self.scraper_patrones.patrones[dominio].get('tipo', 'desconocido')
+        clave_patron = clave_patron or self.scraper_patrones.resolver_patron(url)
+        if clave_patron is not None:
+            return self.scraper_patrones.patrones[clave_patron].get('tipo', 'desconocido')
         return 'patron_conocido'
     
-    def _inferir_tipo_fuente(self, url, datos_crudos):
+    def _inferir_tipo_fuente(self, url, datos_crudos, deteccion=None):
         """Infiere el tipo de fuente cuando no hay patrón"""
-        # Preguntar al detector
         dominio = self.extraer_dominio(url)
         
         # Reglas simples basadas en dominio
@@ -99,6 +155,10 @@ class ScraperHibrido:
         elif any(palabra in dominio for palabra in ['reddit', 'twitter', 'tiktok']):
             return 'red_social'
         
+        # Preguntar al detector (ya calculado y cacheado en el documento)
+        if deteccion is not None:
+            return deteccion['tipo']
+        
         # Si no se identifica, usar 'desconocido'
         return 'desconocido'
     
@@ -107,9 +167,20 @@ class ScraperHibrido:
         parsed = urllib.parse.urlparse(url)
         return parsed.netloc.replace('www.', '')    
     
+    def iterar_muchos(self, urls, max_workers=None):
+        """
+        Scrapea varias URLs en paralelo y entrega (url, datos) según termina cada una.
+        Las descargas respetan el ritmo por host del descargador y las páginas JS se
+        reparten entre los navegadores del pool.
+        """
+        with ThreadPoolExecutor(max_workers=max_workers or self.navegadores) as pool:
+            futuros = {pool.submit(self.scrape, url): url for url in urls}
+            for futuro in as_completed(futuros):
+                yield futuros[futuro], futuro.result()
+    
     def cerrar_selenium(self):
-        """Cierra el driver de Selenium si está activo"""
-        if self.scraper_selenium:
-            print("🔻 Cerrando navegador Selenium...")
-            self.scraper_selenium.cerrar()
-            self.scraper_selenium = None
\ No newline at end of file
+        """Cierra los navegadores de Selenium si están activos"""
+        if self.pool_selenium:
+            print(f"🔻 Cerrando {len(self.pool_selenium)} navegador(es) Selenium...")
+            self.pool_selenium.cerrar()
+            self.pool_selenium = None
\ No newline at end of file
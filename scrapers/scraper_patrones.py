@@ -4,6 +4,12 @@ import os
 import re
 from urllib.parse import urlparse
 from .base import BaseScraper
+from .plan_selectores import PlanSelectores, PatronInvalido
+from .indice_dominios import IndiceDominios
+from utils.parseo import parsear_html, IndiceClases, RE_AUTOR, RE_FECHA, TAGS_TITULO
+
+RE_CONTENEDOR_FALLBACK = re.compile(r'(post|article|thread|discussion|message|item)', re.I)
+RE_AUTOR_FALLBACK = re.compile(RE_AUTOR.pattern + r'|user', re.I)
 
 class ScraperConPatrones(BaseScraper):
     """
@@ -11,141 +17,89 @@ class ScraperConPatrones(BaseScraper):
     Implementa la clase base abstracta BaseScraper
     """
     
-    def __init__(self, descargador):
+    def __init__(self, descargador, debug=False):
         super().__init__(descargador)
+        self.debug = debug  # True: imprime el análisis de cada contenedor y selector
+        self.diagnostico = {}  # contadores de la última extracción por patrones
         self.patrones = self._cargar_patrones()
+        self.indice = IndiceDominios(self.patrones)
     
     def puede_manejar(self, url):
+        """Determina si este scraper puede manejar la URL (hay patrón para su dominio)"""
+        return self.resolver_patron(url) is not None
+    
+    def resolver_patron(self, url):
         """
-        Determina si este scraper puede manejar la URL
-        Versión mejorada: busca coincidencias parciales
+        Clave del patrón para la URL, o None. Búsqueda en el trie de dominios
+        (cacheada por host), así puede_manejar, scrape y el orquestador no repiten la búsqueda.
         """
-        dominio = self.extraer_dominio(url)
-        
-        # 1. Buscar coincidencia exacta de dominio
-        if dominio in self.patrones:
-            return True
-        
-        # 2. Buscar coincidencia parcial en las claves
-        for key in self.patrones.keys():
-            if dominio in key or key in url:
-                return True
-        
-        # 3. Para sitios Apple específicos
-        if 'apple' in dominio:
-            # Buscar cualquier patrón que sea para Apple
-            for key, patron in self.patrones.items():
-                if patron.get('marca') == 'Apple' and dominio in patron.get('url', ''):
-                    return True
-        
-        return False
+        return self.indice.resolver(url)
     
-    def scrape(self, url):
+    def scrape(self, url, soup=None, clave_patron=None, documento=None):
         """
         Extrae datos usando patrones pre-configurados
-        Versión mejorada con lógica de fallback
+        Versión mejorada con lógica de fallback.
+        Si se pasa `soup` (ya parseado por el orquestador) no se descarga ni se re-parsea,
+        y si se pasa `clave_patron` (ya resuelta con resolver_patron) no se vuelve a buscar.
+        Con `documento` (DocumentoPagina) se usan su soup y su índice de clases cacheados.
         """
-        if not self.puede_manejar(url):
+        if documento is not None and soup is None:
+            soup = documento.soup
+        clave_patron = clave_patron or self.resolver_patron(url)
+        if clave_patron is None:
             print(f"⚠️ No hay patrón para: {url}")
             return []
         
         dominio = self.extraer_dominio(url)
-        
-        # Encontrar el patrón correcto (puede haber coincidencia parcial)
-        patron = None
-        if dominio in self.patrones:
-            patron = self.patrones[dominio]
-        else:
-            # Buscar coincidencia parcial
-            for key, value in self.patrones.items():
-                if dominio in key or key in url:
-                    patron = value
-                    print(f"🔍 Coincidencia parcial: {key} → {dominio}")
-                    break
-        
-        if not patron:
-            print(f"⚠️ No se encontró patrón para: {dominio}")
-            return []
+        patron = self.patrones[clave_patron]
+        if clave_patron != dominio:
+            print(f"🔍 Coincidencia por dominio: {clave_patron} → {dominio}")
         
         print(f"✅ Usando patrón para: {dominio} ({patron.get('tipo', 'desconocido')})")
         
-        # Descargar página
-        html = self.descargador.descargar(url)
-        if not html:
-            return []
-        
-        # Parsear con BeautifulSoup
-        from bs4 import BeautifulSoup
-        soup = BeautifulSoup(html, 'html.parser')
+        # Descargar y parsear solo si no nos dieron el documento
+        if soup is None:
+            html = self.descargador.descargar(url)
+            if not html:
+                return []
+            soup = parsear_html(html)
         
         datos_extraidos = []
         
         try:
             # Primero intentar con patrones específicos
-            datos_extraidos = self._extraer_con_patrones(soup, patron, url)
+            datos_extraidos = self._extraer_con_patrones(soup, self.planes[clave_patron], url)
             
             # Si no funciona, intentar con heurísticas de respaldo
             if len(datos_extraidos) == 0:
                 print("⚠️ Patrones no funcionaron, intentando heurísticas de respaldo...")
-                datos_extraidos = self._extraer_con_fallback(soup, url, patron)
+                datos_extraidos = self._extraer_con_fallback(soup, url, patron, documento)
             
         except Exception as e:
             print(f"❌ Error en scraping por patrones: {e}")
             # Último recurso: intentar fallback
-            datos_extraidos = self._extraer_con_fallback(soup, url, patron)
+            datos_extraidos = self._extraer_con_fallback(soup, url, patron, documento)
         
         print(f"📊 Extraídos {len(datos_extraidos)} elementos de {dominio}")
         return datos_extraidos
-    # En scraper_patrones.py, añade este método para extracción profunda
-    def _extraer_texto_completo(self, contenedor, selectores, url):
-        """Estrategia exhaustiva para extraer el máximo texto posible"""
-        texto_completo = []
-        
-        # 1. Intentar con el selector específico del patrón
-        if 'texto' in selectores:
-            elementos = contenedor.select(selectores['texto'])
-            for elem in elementos[:5]:  # Limitar a 5 elementos
-                texto = elem.get_text(' ', strip=True)
-                if len(texto) > 50:  # Solo texto significativo
-                    texto_completo.append(texto)
-        
-        # 2. Si no hay suficiente texto, buscar todos los párrafos
-        if len(' '.join(texto_completo)) < 200:
-            parrafos = contenedor.find_all('p')
-            for p in parrafos[:10]:
-                texto = p.get_text(' ', strip=True)
-                if len(texto) > 30:
-                    texto_completo.append(texto)
-        
-        # 3. Último recurso: extraer todo el texto del contenedor
-        if len(' '.join(texto_completo)) < 100:
-            todo_texto = contenedor.get_text(' ', strip=True)
-            # Limpiar texto excesivamente largo
-            lines = todo_texto.split('. ')
-            texto_completo.extend([line for line in lines[:15] if len(line) > 20])
-        
-        return ' '.join(texto_completo)[:3000]  # Limitar a 3000 caracteres
-    def _extraer_texto_completo(self, contenedor, selectores, url):
+    
+    def _extraer_texto_completo(self, contenedor, encontrados):
         """Estrategia exhaustiva para extraer el máximo texto posible"""
         texto_completo = []
         
-        print(f"    Usando extracción completa...")
+        self._debug("    Usando extracción completa...")
         
-        # 1. Intentar con CADA selector de texto (no solo el primero)
-        if 'texto' in selectores:
-            for selector in selectores['texto'].split(', '):
-                elementos = contenedor.select(selector.strip())
-                for elem in elementos[:3]:
-                    texto = elem.get_text(' ', strip=True)
-                    if len(texto) > 30:
-                        texto_completo.append(texto)
-                        print(f"      Selector '{selector}': {len(texto)} chars")
+        # 1. Todos los elementos del selector de texto (ya seleccionados una vez)
+        for elem in encontrados.get('texto', [])[:6]:
+            texto = elem.get_text(' ', strip=True)
+            if len(texto) > 30:
+                texto_completo.append(texto)
         
         # 2. Si no hay suficiente texto, buscar todos los párrafos
         if len(' '.join(texto_completo)) < 100:
-            parrafos = contenedor.find_all('p')
-            print(f"      Encontrados {len(parrafos)} párrafos")
-            for p in parrafos[:15]:
+            parrafos = contenedor.find_all('p', limit=15)
+            self._debug(f"      Encontrados {len(parrafos)} párrafos")
+            for p in parrafos:
                 texto = p.get_text(' ', strip=True)
                 if len(texto) > 20:
                     texto_completo.append(texto)
@@ -156,116 +110,121 @@ class ScraperConPatrones(BaseScraper):
             # Dividir en oraciones significativas
             oraciones = [o.strip() for o in todo_texto.split('. ') if 20 < len(o.strip()) < 300]
             texto_completo.extend(oraciones[:10])
-            print(f"      Extraído texto crudo: {len(todo_texto)} chars total")
+            self._debug(f"      Extraído texto crudo: {len(todo_texto)} chars total")
         
         resultado = ' '.join(texto_completo)
         
         if resultado:
             resultado = ' '.join(resultado.split())[:3000]
-            print(f"      Resultado final: {len(resultado)} caracteres")
+            self._debug(f"      Resultado final: {len(resultado)} caracteres")
         
         return resultado
 
-    def _extraer_con_patrones(self, soup, patron, url):
-        """Extracción usando los selectores del patrón"""
+    def _extraer_con_patrones(self, soup, plan, url):
+        """
+        Extracción usando el plan de selectores precompilado del patrón.
+        Recorre TODOS los contenedores y evalúa cada selector una sola vez por contenedor.
+        """
         datos = []
-        selectores = patron.get('selectores', {})
+        selectores = plan.selectores
         
-        print(f"🔍 PATRÓN ACTIVO: {json.dumps(selectores, indent=2)}") 
+        if self.debug:
+            self._debug(f"🔍 PATRÓN ACTIVO: {json.dumps(selectores, indent=2)}")
         
         # Buscar contenedores principales
         selector_contenedor = selectores.get('contenedor', 'body')
-        contenedores = soup.select(selector_contenedor)
-        
+        contenedores = plan.contenedores(soup)
+        
+        # Diagnóstico estructurado: contadores baratos, se imprimen solo en modo debug
+        diagnostico = {
+            'selector_contenedor': selector_contenedor,
+            'contenedores': len(contenedores),
+            'extraidos': 0,
+            'errores': 0,
+            'aciertos_selector': {clave: 0 for clave, _, _ in plan.campos}
+        }
+        self.diagnostico = diagnostico
         print(f"🔍 Encontrados {len(contenedores)} contenedores con selector: {selector_contenedor}")
         
-        for i, contenedor in enumerate(contenedores[:3]):  # Solo primeros 3 para diagnóstico
+        for i, contenedor in enumerate(contenedores):
             try:
                 item = {}
                 
-                # DIAGNÓSTICO: Mostrar qué estamos viendo
-                print(f"\n🔍 ANALIZANDO CONTENEDOR {i}:")
-                print(f"  HTML: {str(contenedor)[:200]}...")
+                # Una sola pasada por los matchers precompilados: texto/contenido completos
+                # (se reutilizan en la extracción de texto); título/autor/fecha solo el primero
+                encontrados = plan.extraer_campos(contenedor)
+                for clave, elementos in encontrados.items():
+                    if elementos:
+                        diagnostico['aciertos_selector'][clave] += 1
                 
-                # Prueba cada selector
-                for clave, selector in selectores.items():
-                    elementos = contenedor.select(selector)
-                    print(f"  Selector '{clave}' ('{selector}'): {len(elementos)} elementos encontrados")
-                    
-                    if elementos and clave in ['texto', 'contenido']:
-                        print(f"    Texto del primer elemento: {elementos[0].get_text(strip=True)[:100]}...")
+                if self.debug:
+                    self._debug(f"\n🔍 ANALIZANDO CONTENEDOR {i}:")
+                    self._debug(f"  HTML: {str(contenedor)[:200]}...")
+                    for clave, elementos in encontrados.items():
+                        self._debug(f"  Selector '{clave}' ('{selectores[clave]}'): {len(elementos)} elementos encontrados")
                 
                 # Extraer título
-                if 'titulo' in selectores:
-                    titulo_elem = contenedor.select_one(selectores['titulo'])
-                    if titulo_elem:
-                        item['titulo'] = titulo_elem.get_text(strip=True)
+                if encontrados.get('titulo'):
+                    item['titulo'] = encontrados['titulo'][0].get_text(strip=True)
                 
                 # Extraer contenido/texto con estrategia mejorada
-                item['texto'] = self._extraer_texto_mejorado(contenedor, selectores)
+                item['texto'] = self._extraer_texto_mejorado(contenedor, encontrados)
                 
                 # Si aún no hay texto, usar método exhaustivo
                 if not item.get('texto') or len(item['texto'].strip()) < 20:
-                    item['texto'] = self._extraer_texto_completo(contenedor, selectores, url)
+                    item['texto'] = self._extraer_texto_completo(contenedor, encontrados)
                 
                 # Extraer autor
-                if 'autor' in selectores:
-                    autor_elem = contenedor.select_one(selectores['autor'])
-                    if autor_elem:
-                        item['autor'] = autor_elem.get_text(strip=True)
+                if encontrados.get('autor'):
+                    item['autor'] = encontrados['autor'][0].get_text(strip=True)
                 
                 # Extraer fecha
-                if 'fecha' in selectores:
-                    fecha_elem = contenedor.select_one(selectores['fecha'])
-                    if fecha_elem:
-                        item['fecha'] = fecha_elem.get_text(strip=True)
+                if encontrados.get('fecha'):
+                    item['fecha'] = encontrados['fecha'][0].get_text(strip=True)
                 
                 # Si se extrajo algún dato, agregarlo
                 if item.get('titulo') or item.get('texto'):
                     item['url_fuente'] = url
-                    item['tipo_fuente'] = patron.get('tipo', 'desconocido')
+                    item['tipo_fuente'] = plan.tipo
                     datos.append(item)
-                    print(f"✅ Elemento {i} extraído: '{item.get('titulo', 'Sin título')[:50]}...'")
+                    diagnostico['extraidos'] += 1
+                    self._debug(f"✅ Elemento {i} extraído: '{item.get('titulo', 'Sin título')[:50]}...'")
                     
             except Exception as e:
-                print(f"⚠️ Error en elemento {i}: {e}")
+                diagnostico['errores'] += 1
+                self._debug(f"⚠️ Error en elemento {i}: {e}")
                 continue
         
+        if self.debug:
+            self._debug(f"📋 Diagnóstico: {json.dumps(diagnostico, ensure_ascii=False)}")
         return datos
 
 
-    def _extraer_texto_mejorado(self, contenedor, selectores):
-        """Extrae texto usando TODOS los selectores posibles"""
+    def _extraer_texto_mejorado(self, contenedor, encontrados):
+        """Extrae texto usando los elementos ya seleccionados por el patrón"""
         textos = []
         
-        # 1. Usar selectores de texto del patrón (TODOS los elementos)
-        if 'texto' in selectores:
-            elementos = contenedor.select(selectores['texto'])
-            for elem in elementos[:3]:  # Primeros 3 elementos
-                texto = elem.get_text(' ', strip=True)
-                if texto and len(texto) > 10:
-                    textos.append(texto)
-        
-        # 2. Si no hay suficiente, usar selector de contenido
-        if len(' '.join(textos)) < 50 and 'contenido' in selectores:
-            elementos = contenedor.select(selectores['contenido'])
-            for elem in elementos[:2]:
+        # 1-2. Cadena de respaldo del plan: texto (3 primeros) y, si no basta, contenido (2)
+        for clave, limite in zip(PlanSelectores.CADENA_TEXTO, (3, 2)):
+            if len(' '.join(textos)) >= 50:
+                break
+            for elem in encontrados.get(clave, [])[:limite]:
                 texto = elem.get_text(' ', strip=True)
                 if texto and len(texto) > 10:
                     textos.append(texto)
         
         # 3. Si aún no hay, buscar párrafos
         if len(' '.join(textos)) < 100:
-            parrafos = contenedor.find_all('p')
-            for p in parrafos[:5]:
+            parrafos = contenedor.find_all('p', limit=5)
+            for p in parrafos:
                 texto = p.get_text(' ', strip=True)
                 if texto and len(texto) > 20:
                     textos.append(texto)
         
         # 4. Extraer de spans y divs con texto
         if len(' '.join(textos)) < 100:
-            elementos_texto = contenedor.find_all(['span', 'div'], string=True)
-            for elem in elementos_texto[:10]:
+            elementos_texto = contenedor.find_all(['span', 'div'], string=True, limit=10)
+            for elem in elementos_texto:
                 texto = elem.get_text(' ', strip=True)
                 if texto and 20 < len(texto) < 500:
                     textos.append(texto)
@@ -280,33 +239,30 @@ class ScraperConPatrones(BaseScraper):
             if len(resultado) > 3000:
                 resultado = resultado[:3000] + "..."
         
-        print(f"    Texto extraído mejorado: {len(resultado)} caracteres")
+        self._debug(f"    Texto extraído mejorado: {len(resultado)} caracteres")
         return resultado
-        
-    
-    
-    
     
+    def _debug(self, mensaje):
+        """Print de diagnóstico, solo con debug=True"""
+        if self.debug:
+            print(mensaje)
     
-    
-    
-    
-    
-    
-    
-    
-    def _extraer_con_fallback(self, soup, url, patron):
+    def _extraer_con_fallback(self, soup, url, patron, documento=None):
         """Extracción de respaldo cuando los selectores específicos fallan"""
         datos = []
         
         print("🔄 Usando estrategia de fallback...")
         
+        # Un pase de indexado (reutilizado si el documento ya lo tiene); autor/fecha/título
+        # pasan a ser búsquedas en el índice
+        indice = documento.indice if documento is not None else IndiceClases(soup)
+        
         # Strategy 1: Buscar cualquier article o contenedor semántico
         contenedores = soup.find_all(['article', 'section', 'div'], class_=True)
         
         if not contenedores:
             # Strategy 2: Buscar cualquier elemento con clase que contenga post/article/thread
-            contenedores = soup.find_all(class_=re.compile(r'(post|article|thread|discussion|message|item)', re.I))
+            contenedores = indice.con_clase(RE_CONTENEDOR_FALLBACK)
         
         if not contenedores:
             # Strategy 3: Buscar cualquier div con clase
@@ -319,35 +275,33 @@ class ScraperConPatrones(BaseScraper):
                 item = {}
                 
                 # Buscar título (cualquier h1-h3)
-                titulo_elem = contenedor.find(['h1', 'h2', 'h3', 'h4'])
+                titulo_elem = indice.primero_con_tag(TAGS_TITULO, dentro_de=contenedor)
                 if titulo_elem:
                     item['titulo'] = titulo_elem.get_text(strip=True)
                 
                 # Si no hay título específico, buscar en textos grandes
                 if not item.get('titulo'):
-                    textos_grandes = contenedor.find_all(['p', 'span', 'div'], string=True)
-                    if textos_grandes:
-                        # Tomar el texto más largo como posible título
-                        textos = [t.get_text(strip=True) for t in textos_grandes if len(t.get_text(strip=True)) > 20]
-                        if textos:
-                            item['titulo'] = textos[0][:100]
+                    for t in indice.con_tag(('p', 'span', 'div'), dentro_de=contenedor):
+                        if t.string is not None and len(t.get_text(strip=True)) > 20:
+                            item['titulo'] = t.get_text(strip=True)[:100]
+                            break
                 
                 # Buscar texto (párrafos)
-                parrafos = contenedor.find_all('p')
+                parrafos = indice.con_tag('p', dentro_de=contenedor)
                 if parrafos:
                     texto = ' '.join([p.get_text(strip=True) for p in parrafos[:5]])
                     if texto and len(texto) > 10:  # Solo si tiene suficiente contenido
                         item['texto'] = texto[:1000]  # Limitar
                 
                 # Buscar autor
-                autor_elem = contenedor.find(class_=re.compile(r'(author|byline|user|username|writer)', re.I))
+                autor_elem = indice.primero_con_clase(RE_AUTOR_FALLBACK, dentro_de=contenedor)
                 if autor_elem:
                     item['autor'] = autor_elem.get_text(strip=True)
                 
                 # Buscar fecha
-                fecha_elem = contenedor.find(class_=re.compile(r'(date|time|posted|datetime|published)', re.I))
+                fecha_elem = indice.primero_con_clase(RE_FECHA, dentro_de=contenedor)
                 if not fecha_elem:
-                    fecha_elem = contenedor.find('time')
+                    fecha_elem = indice.primero_con_tag('time', dentro_de=contenedor)
                 if fecha_elem:
                     item['fecha'] = fecha_elem.get_text(strip=True)
                 
@@ -376,15 +330,32 @@ class ScraperConPatrones(BaseScraper):
         return dominio
     
     def _cargar_patrones(self):
-        """Carga los patrones desde el archivo JSON"""
+        """
+        Carga los patrones desde el archivo JSON y compila cada uno en un PlanSelectores
+        (self.planes). Los patrones con selectores inválidos se descartan al cargar.
+        """
+        self.planes = {}
         try:
             ruta_patrones = os.path.join('config', 'patrones.json')
             if os.path.exists(ruta_patrones):
                 with open(ruta_patrones, 'r', encoding='utf-8') as f:
-                    return json.load(f)
+                    patrones = json.load(f)
             else:
                 print(f"⚠️ Archivo {ruta_patrones} no encontrado")
                 return {}
         except Exception as e:
             print(f"⚠️ Error cargando patrones: {e}")
-            return {}
\ No newline at end of file
+            return {}
+        
+        validos = {}
+        for clave, patron in patrones.items():
+            try:
+                plan = PlanSelectores(clave, patron)
+            except PatronInvalido as e:
+                print(f"⚠️ Patrón '{clave}' descartado: {e}")
+                continue
+            if plan.ignorados:
+                print(f"⚠️ Patrón '{clave}': selectores sin uso {plan.ignorados}")
+            self.planes[clave] = plan
+            validos[clave] = patron
+        return validos
\ No newline at end of file
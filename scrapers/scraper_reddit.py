@@ -1,10 +1,34 @@
-import requests
-import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 
+from utils.http_cliente import ClienteHTTP
+from utils.limitador import CubetaTokens
+
 class ScraperReddit:
-    def __init__(self, delay=3):
-        self.delay = delay
+    def __init__(self, peticiones_por_segundo=4.0, rafaga=10, cliente=None, max_workers=4, limitador=None,
+                 max_resultados=200, max_profundidad=5, max_hijos=50, max_llamadas_more=3,
+                 estado=None, dias_revisita=3):
+        self.peticiones_por_segundo = peticiones_por_segundo
+        # Conexiones keep-alive reutilizadas entre búsquedas y comentarios
+        self.cliente = cliente or ClienteHTTP()
+        # Descargas de comentarios simultáneas por página de búsqueda
+        self.max_workers = max_workers
+        # Un único ritmo para TODO el tráfico a Reddit (todos los hilos y subreddits):
+        # hasta `rafaga` requests seguidos y luego `peticiones_por_segundo` sostenidos.
+        # Con latencias de ~0.5-1s, 4/s deja varios GET de comentarios en vuelo a la vez
+        self.limitador = limitador or CubetaTokens(tasa=peticiones_por_segundo, capacidad=rafaga)
+        # Límite de comentarios por subreddit (y por post)
+        self.max_resultados = max_resultados
+        # Presupuestos del recorrido del árbol de comentarios
+        self.max_profundidad = max_profundidad      # 0 = solo primer nivel
+        self.max_hijos = max_hijos                  # respuestas visitadas por comentario
+        self.max_llamadas_more = max_llamadas_more  # lotes /api/morechildren por post
+        # Checkpoints por (subreddit, query): utils.estado_incremental.EstadoIncremental
+        self.estado = estado
+        # Posts ya conocidos que se vuelven a recorrer buscando respuestas nuevas
+        self.dias_revisita = dias_revisita
         self.headers = {
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
                           "AppleWebKit/537.36 (KHTML, like Gecko) "
@@ -15,88 +39,246 @@ class ScraperReddit:
         """
         Versión mejorada: saca COMENTARIOS (replies) de posts relevantes,
         no solo títulos/selftext. Más opiniones reales y menos ruido.
+        Con `estado`, las ejecuciones siguientes recorren los posts más nuevos
+        que la marca de agua y también los conocidos de los últimos
+        `dias_revisita` días (para traer respuestas nuevas); los comentarios
+        ya vistos se descartan por ID.
         """
         resultados = []
         after = None
         pages = max(1, limit // 5)  # Más páginas para más posts
 
-        for _ in range(pages):
-            url = f"https://www.reddit.com/r/{subreddit}/search.json"
-            params = {
-                "q": query,
-                "restrict_sr": 1,
-                "sort": "relevance",
-                "t": "year",
-                "limit": 25,  # Subimos de 10 a 25 posts por página
-                "after": after
-            }
+        clave = f"{subreddit}|{query}"
+        marca_agua = self.estado.marca_agua(clave) if self.estado else None
+        vistos = self.estado.ids_vistos(clave) if self.estado else set()
+        # Posts con fecha anterior a este límite ya no se vuelven a recorrer
+        limite_revisita = marca_agua - self.dias_revisita * 86400 if marca_agua else None
+        if marca_agua:
+            print(f"   ↻ r/{subreddit}: modo incremental desde {datetime.fromtimestamp(marca_agua).isoformat()}")
 
-            try:
-                r = requests.get(url, headers=self.headers, params=params, timeout=15)
-                if r.status_code != 200:
-                    print(f"⚠️ Reddit HTTP {r.status_code} en r/{subreddit}")
-                    break
+        # Primera pasada (por relevancia): la marca se fija siempre con el post más nuevo
+        # visto, aunque haya corte, para que la siguiente ya vaya en incremental.
+        # En incremental solo sube si el recorrido terminó entero: sin errores, sin
+        # cortes por límite y bajando hasta lo ya conocido. El listado llega de más
+        # nuevo a más viejo, así que un corte dejaría posts nuevos sin recoger por
+        # debajo de la marca.
+        max_created = None
+        completo = False
+        incompleto = False  # algún post se quedó a medias (error o presupuesto)
 
-                data = r.json()
-                posts = data.get("data", {}).get("children", [])
-                if not posts:
-                    break
+        # Al alcanzar el límite se cancela lo pendiente y los hilos en curso cortan su recorrido
+        pool = ThreadPoolExecutor(max_workers=self.max_workers)
+        detener = threading.Event()
+        try:
+            for _ in range(pages):
+                url = f"https://www.reddit.com/r/{subreddit}/search.json"
+                params = {
+                    "q": query,
+                    "restrict_sr": 1,
+                    # Incremental: lo más nuevo primero para cortar al llegar a lo conocido
+                    "sort": "new" if marca_agua else "relevance",
+                    "t": "year",
+                    "limit": 25,  # Subimos de 10 a 25 posts por página
+                    "after": after
+                }
 
-                for post in posts:
-                    p = post["data"]
-                    post_permalink = p.get('permalink', '')
-                    if not post_permalink:
-                        continue
-
-                    # === NUEVO: Scrapeamos los comentarios del post ===
-                    comments_url = f"https://www.reddit.com{post_permalink}.json"
-                    try:
-                        r_comments = requests.get(comments_url, headers=self.headers, timeout=15)
-                        if r_comments.status_code != 200:
-                            continue
-
-                        comments_data = r_comments.json()
-                        # comments_data[1] contiene los comentarios (el [0] es el post)
-                        if len(comments_data) < 2:
-                            continue
-
-                        comments_tree = comments_data[1].get("data", {}).get("children", [])
-
-                        for comment_item in comments_tree:
-                            if comment_item["kind"] != "t1":  # Solo comentarios reales
-                                continue
-                            comment = comment_item["data"]
-                            body = comment.get("body", "").strip()
-                            if len(body) < 25:  # Filtro anti-ruido
-                                continue
-
-                            resultados.append({
-                                "texto": body[:2000],
-                                "url": f"https://reddit.com{comment.get('permalink', '')}",
-                                "fuente": "reddit",
-                                "plataforma": "reddit",
-                                "subreddit": subreddit,
-                                "autor": comment.get("author", "[deleted]"),
-                                "score": comment.get("score", 0),
-                                "fecha": datetime.fromtimestamp(comment.get("created_utc", 0)).isoformat()
-                            })
-
-                            # Límite por post para no saturar
-                            if len(resultados) >= 200:  # Puedes subir a 300-500
-                                return resultados
-
-                    except Exception as e:
-                        print(f"Error scrapeando comentarios de post {post_permalink}: {e}")
-                        continue
-
-                after = data.get("data", {}).get("after")
-                if not after:
-                    break
+                try:
+                    r = self._get(url, params=params)
+                    if r.status_code != 200:
+                        print(f"⚠️ Reddit HTTP {r.status_code} en r/{subreddit}")
+                        break
 
-                time.sleep(self.delay + 2)  # Delay más largo por doble request
+                    data = r.json()
+                    posts = [p["data"] for p in data.get("data", {}).get("children", [])]
+                    if not posts:
+                        completo = True
+                        break
 
-            except Exception as e:
-                print(f"❌ Error Reddit ({subreddit}): {e}")
-                break
+                    # Una sola lista filtrada: cada post va emparejado con SUS comentarios
+                    a_recorrer = [
+                        p for p in posts
+                        if p.get("permalink") and (not limite_revisita or p.get("created_utc", 0) > limite_revisita)
+                    ]
+
+                    # === Comentarios de todos los posts de la página en paralelo ===
+                    for post, (comentarios, post_completo) in zip(a_recorrer, pool.map(
+                            lambda p: self._scrape_comentarios_post(subreddit, p["permalink"], vistos, detener),
+                            a_recorrer)):
+                        incompleto = incompleto or not post_completo
+                        resultados.extend(comentarios)
+                        max_created = max(max_created or 0, post.get("created_utc", 0))
+
+                        # Límite por subreddit para no saturar (en incremental la marca no se mueve)
+                        if len(resultados) >= self.max_resultados:
+                            resultados = resultados[:self.max_resultados]
+                            return resultados
+
+                    # Ya llegamos a posts fuera de la ventana de revisita: no hay más delta
+                    after = data.get("data", {}).get("after")
+                    fuera_de_ventana = limite_revisita and any(
+                        p.get("created_utc", 0) <= limite_revisita for p in posts
+                    )
+                    if not after or fuera_de_ventana:
+                        completo = True
+                        break
+
+                except Exception as e:
+                    print(f"❌ Error Reddit ({subreddit}): {e}")
+                    break
+            else:
+                # Se acabaron las páginas: en incremental puede quedar delta sin recoger
+                completo = not marca_agua
+        finally:
+            # Nada queda corriendo en segundo plano (ni usando el limitador) tras volver
+            detener.set()
+            pool.shutdown(wait=True, cancel_futures=True)
+            if self.estado:
+                if not marca_agua:
+                    nueva_marca = max_created
+                else:
+                    nueva_marca = max_created if completo and not incompleto else None
+                self.estado.registrar(
+                    clave,
+                    ids=[c["comentario_id"] for c in resultados],
+                    marca_agua=nueva_marca
+                )
+                self.estado.guardar()
 
         return resultados
+
+    def iterar_varios(self, subreddits_queries, limit=10, max_workers=8):
+        """
+        Scrapea varios subreddits a la vez ({subreddit: query}) y entrega
+        (subreddit, resultados) según termina cada uno.
+        Todos comparten el mismo limitador de Reddit.
+        """
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(subreddits_queries)))) as pool:
+            futuros = {
+                pool.submit(self.scrape_subreddit, sub, query, limit): sub
+                for sub, query in subreddits_queries.items()
+            }
+            for futuro in as_completed(futuros):
+                yield futuros[futuro], futuro.result()
+
+    def _get(self, url, params=None):
+        """GET a Reddit respetando el limitador compartido"""
+        self.limitador.adquirir()
+        return self.cliente.get(url, headers=self.headers, params=params, timeout=15)
+
+    def iterar_comentarios(self, post_permalink):
+        """
+        Generador que recorre el árbol completo de comentarios de un post
+        (respuestas anidadas incluidas) sin recursión y sin guardar el árbol.
+        Los stubs "more" se resuelven por lotes con /api/morechildren.
+        Respeta los presupuestos max_profundidad, max_hijos y max_llamadas_more.
+        Produce el dict `data` de cada comentario t1.
+        """
+        r = self._get(f"https://www.reddit.com{post_permalink}.json")
+        if r.status_code != 200:
+            # Error y no "post sin comentarios": quien recorre debe saber que quedó incompleto
+            raise RuntimeError(f"HTTP {r.status_code} en {post_permalink}")
+
+        listado = r.json()
+        # listado[1] contiene los comentarios (el [0] es el post)
+        if len(listado) < 2:
+            return
+        post = listado[0].get("data", {}).get("children", [])
+        link_id = post[0]["data"].get("name") if post else None
+
+        # Cola de nodos por visitar + IDs "more" pendientes de resolver
+        pendientes = deque(listado[1].get("data", {}).get("children", []))
+        ids_more = []
+        hijos_por_padre = {}
+        llamadas_more = 0
+
+        while pendientes or ids_more:
+            if not pendientes:
+                # Cola vacía: toca resolver un lote de "more"
+                if not link_id or llamadas_more >= self.max_llamadas_more:
+                    return
+                lote, ids_more = ids_more[:100], ids_more[100:]
+                llamadas_more += 1
+                pendientes.extend(self._resolver_more(link_id, lote))
+                continue
+
+            item = pendientes.popleft()
+            data = item.get("data", {})
+            profundidad = data.get("depth", 0)
+            if profundidad > self.max_profundidad:
+                continue
+
+            # Presupuesto de anchura: hijos visitados por cada padre
+            padre = data.get("parent_id")
+            hijos_por_padre[padre] = hijos_por_padre.get(padre, 0) + 1
+            if hijos_por_padre[padre] > self.max_hijos:
+                continue
+
+            if item.get("kind") == "more":
+                # El stub "continuar hilo" (id '_') no trae IDs: se ignora
+                ids_more.extend(i for i in data.get("children", []) if i != "_")
+                continue
+            if item.get("kind") != "t1":  # Solo comentarios reales
+                continue
+
+            yield data
+
+            respuestas = data.get("replies")
+            if isinstance(respuestas, dict):
+                pendientes.extend(respuestas.get("data", {}).get("children", []))
+
+    def _resolver_more(self, link_id, ids):
+        """Devuelve los nodos (t1 o more) de un lote de IDs "more" """
+        try:
+            r = self._get(
+                "https://www.reddit.com/api/morechildren.json",
+                params={
+                    "api_type": "json",
+                    "link_id": link_id,
+                    "children": ",".join(ids),
+                    "sort": "confidence"
+                }
+            )
+            if r.status_code != 200:
+                return []
+            return r.json().get("json", {}).get("data", {}).get("things", [])
+        except Exception as e:
+            print(f"Error resolviendo 'more' de {link_id}: {e}")
+            return []
+
+    def _scrape_comentarios_post(self, subreddit, post_permalink, vistos=frozenset(), detener=None):
+        """
+        Recorre el árbol de comentarios de un post y filtra el ruido y lo ya visto.
+        Si `detener` (threading.Event) se activa, corta sin pedir más páginas.
+        Devuelve (resultados, completo): completo=False si hubo error o corte.
+        """
+        resultados = []
+        try:
+            for comment in self.iterar_comentarios(post_permalink):
+                if detener is not None and detener.is_set():
+                    return resultados, False
+                if comment.get("name") in vistos:
+                    continue
+                body = comment.get("body", "").strip()
+                if len(body) < 25:  # Filtro anti-ruido
+                    continue
+
+                resultados.append({
+                    "texto": body[:2000],
+                    "comentario_id": comment.get("name"),
+                    "url": f"https://reddit.com{comment.get('permalink', '')}",
+                    "fuente": "reddit",
+                    "plataforma": "reddit",
+                    "subreddit": subreddit,
+                    "autor": comment.get("author", "[deleted]"),
+                    "score": comment.get("score", 0),
+                    "profundidad": comment.get("depth", 0),
+                    "fecha": datetime.fromtimestamp(comment.get("created_utc", 0)).isoformat()
+                })
+                if len(resultados) >= self.max_resultados:
+                    return resultados, False
+
+        except Exception as e:
+            print(f"Error scrapeando comentarios de post {post_permalink}: {e}")
+            return resultados, False
+
+        return resultados, True
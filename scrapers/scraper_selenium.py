@@ -1,80 +1,169 @@
 # scrapers/scraper_selenium.py
 import os
-import re
 import time
-from bs4 import BeautifulSoup
 
 from selenium import webdriver
-from selenium.webdriver.edge.options import Options
-from selenium.webdriver.edge.service import Service
-from selenium.common.exceptions import TimeoutException
-
-
-class ScraperSelenium:
-    def __init__(self, headless=True, page_load_timeout=30, driver_path=None):
-        options = Options()
-        if headless:
-            options.add_argument("--headless=new")
-            options.add_argument("--disable-gpu")
-
-        options.add_argument("--no-sandbox")
-        options.add_argument("--disable-dev-shm-usage")
-        options.add_argument("--window-size=1920,1080")
-
-        # 1) Prioridad: variable de entorno (evita rutas hardcode)
-        env_path = os.getenv("EDGE_DRIVER_PATH")
-
-        # 2) Prioridad: driver_path pasado por parámetro
-        candidate = driver_path or env_path
-
-        # 3) Prioridad: driver dentro del repo (drivers/msedgedriver.exe)
-        if not candidate:
-            base_dir = os.path.dirname(os.path.dirname(__file__))  # raíz del proyecto
-            candidate = os.path.join(base_dir, "drivers", "msedgedriver.exe")
-
-        # Si existe local, usarlo
-        if os.path.exists(candidate):
-            service = Service(candidate)
-            self.driver = webdriver.Edge(service=service, options=options)
-        else:
-            # Si no existe local, intentamos webdriver_manager (requiere internet)
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.common.exceptions import TimeoutException, WebDriverException
+
+from utils.parseo import parsear_html, IndiceClases, RE_AUTOR, RE_FECHA
+
+# JS que resume el estado del DOM: si no cambia entre sondeos, la página está quieta.
+# No incluye recursos de red: beacons de analítica o polling no paran nunca
+JS_HUELLA_DOM = (
+    "return [document.getElementsByTagName('*').length, "
+    "document.body ? document.body.scrollHeight : 0];"
+)
+
+
+def crear_driver(navegador="edge", headless=True, page_load_timeout=30, driver_path=None):
+    """
+    Crea un WebDriver headless de Edge o Chrome/Chromium.
+    Orden para encontrar el driver: parámetro → variable de entorno
+    (EDGE_DRIVER_PATH / CHROME_DRIVER_PATH) → ./drivers/ → Selenium Manager / webdriver_manager.
+    """
+    navegador = navegador.lower()
+    if navegador == "edge":
+        from selenium.webdriver.edge.options import Options
+        from selenium.webdriver.edge.service import Service
+        env_var, ejecutable, clase = "EDGE_DRIVER_PATH", "msedgedriver.exe", webdriver.Edge
+    elif navegador in ("chrome", "chromium"):
+        from selenium.webdriver.chrome.options import Options
+        from selenium.webdriver.chrome.service import Service
+        env_var, ejecutable, clase = "CHROME_DRIVER_PATH", "chromedriver", webdriver.Chrome
+    else:
+        raise ValueError(f"Navegador no soportado: {navegador} (usa 'edge' o 'chrome')")
+
+    options = Options()
+    if headless:
+        options.add_argument("--headless=new")
+        options.add_argument("--disable-gpu")
+
+    options.add_argument("--no-sandbox")
+    options.add_argument("--disable-dev-shm-usage")
+    options.add_argument("--window-size=1920,1080")
+
+    # Binario de Chromium no estándar (p.ej. /usr/bin/chromium)
+    binario = os.getenv("CHROME_BINARY") if clase is webdriver.Chrome else None
+    if binario:
+        options.binary_location = binario
+
+    # 1) Prioridad: driver_path pasado por parámetro; 2) variable de entorno (evita rutas hardcode)
+    candidate = driver_path or os.getenv(env_var)
+
+    # 3) Prioridad: driver dentro del repo (drivers/msedgedriver.exe o drivers/chromedriver)
+    if not candidate:
+        base_dir = os.path.dirname(os.path.dirname(__file__))  # raíz del proyecto
+        candidate = os.path.join(base_dir, "drivers", ejecutable)
+
+    # Si existe local, usarlo
+    if os.path.exists(candidate):
+        driver = clase(service=Service(candidate), options=options)
+    else:
+        # Si no existe local: Selenium Manager (selenium >= 4.6) y luego webdriver_manager (requieren internet)
+        try:
+            driver = clase(options=options)
+        except Exception:
             try:
-                from webdriver_manager.microsoft import EdgeChromiumDriverManager
-                service = Service(EdgeChromiumDriverManager().install())
-                self.driver = webdriver.Edge(service=service, options=options)
+                if clase is webdriver.Edge:
+                    from webdriver_manager.microsoft import EdgeChromiumDriverManager as Manager
+                else:
+                    from webdriver_manager.chrome import ChromeDriverManager as Manager
+                driver = clase(service=Service(Manager().install()), options=options)
             except Exception as e:
                 raise RuntimeError(
-                    f"No se encontró msedgedriver local y no se pudo descargar. "
-                    f"Coloca el driver en ./drivers/msedgedriver.exe o define EDGE_DRIVER_PATH. "
+                    f"No se encontró {ejecutable} local y no se pudo descargar. "
+                    f"Coloca el driver en ./drivers/{ejecutable} o define {env_var}. "
                     f"Detalle: {e}"
                 )
 
-        self.driver.set_page_load_timeout(page_load_timeout)
+    driver.set_page_load_timeout(page_load_timeout)
+    return driver
+
 
-    def scrape(self, url, max_items=15):
+class ScraperSelenium:
+    def __init__(self, headless=True, page_load_timeout=30, driver_path=None, navegador="edge",
+                 timeout_espera=10, max_scrolls=3):
+        self.driver = crear_driver(navegador, headless, page_load_timeout, driver_path)
+        self.timeout_espera = timeout_espera  # tope TOTAL de esperas por página (tras driver.get)
+        self.max_scrolls = max_scrolls
+        self.sano = True  # False si el driver murió: el pool lo descarta
+        self._limite = None
+
+    def _restante(self):
+        """Segundos que quedan del tope de la página actual"""
+        if self._limite is None:
+            return self.timeout_espera
+        return max(0.0, self._limite - time.monotonic())
+
+    def esperar_pagina(self, selector=None):
+        """
+        Espera por condiciones en vez de sleeps fijos: readyState completo,
+        el selector presente (si se da) y el DOM estable. Todas comparten el
+        tope de la página.
+        """
+        try:
+            WebDriverWait(self.driver, max(self._restante(), 0.1), poll_frequency=0.2).until(
+                lambda d: d.execute_script("return document.readyState") == "complete")
+            if selector:
+                WebDriverWait(self.driver, max(self._restante(), 0.1), poll_frequency=0.2).until(
+                    EC.presence_of_element_located((By.CSS_SELECTOR, selector)))
+        except TimeoutException:
+            print(f"   ⏳ Condición de carga no cumplida en {self.timeout_espera}s, se sigue con lo que hay")
+        self._esperar_dom_estable()
+
+    def _esperar_dom_estable(self, quieto=0.6, sondeo=0.2):
+        """Vuelve cuando nº de nodos y altura no cambian durante `quieto` segundos (o se acaba el tope)"""
+        limite = time.monotonic() + self._restante()
+        anterior = None
+        desde = time.monotonic()
+        while time.monotonic() < limite:
+            huella = self.driver.execute_script(JS_HUELLA_DOM)
+            if huella != anterior:
+                anterior = huella
+                desde = time.monotonic()
+            elif time.monotonic() - desde >= quieto:
+                return True
+            time.sleep(sondeo)
+        return False
+
+    def _scroll_hasta_estable(self):
+        """Scroll infinito: baja mientras aparezca contenido nuevo (máx. max_scrolls veces)"""
+        for _ in range(self.max_scrolls):
+            if self._restante() <= 0:
+                break
+            altura = self.driver.execute_script("return document.body.scrollHeight")
+            self.driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+            self._esperar_dom_estable()
+            if self.driver.execute_script("return document.body.scrollHeight") <= altura:
+                break
+
+    def scrape(self, url, max_items=15, selector_espera=None):
         print(f"🌐 Usando Selenium para cargar JS en: {url}")
         try:
             self.driver.get(url)
-            time.sleep(4)
-
-            for _ in range(3):
-                self.driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-                time.sleep(2)
+            # Un único tope para readyState + selector + DOM estable + scrolls
+            self._limite = time.monotonic() + self.timeout_espera
+            self.esperar_pagina(selector_espera)
+            self._scroll_hasta_estable()
 
-            soup = BeautifulSoup(self.driver.page_source, "html.parser")
+            soup = parsear_html(self.driver.page_source)
+            indice = IndiceClases(soup)
             datos = []
 
             contenedores = soup.find_all(["article", "div", "li"], class_=True)[:150]
             for cont in contenedores:
                 item = {}
 
-                titulo_elem = cont.find(["h1", "h2", "h3", "h4", "a"])
+                titulo_elem = indice.primero_con_tag(("h1", "h2", "h3", "h4", "a"), dentro_de=cont)
                 if titulo_elem:
                     t = titulo_elem.get_text(strip=True)
                     if t:
                         item["titulo"] = t[:200]
 
-                textos = cont.find_all(["p", "div", "span"])
+                textos = indice.con_tag(("p", "div", "span"), dentro_de=cont)
                 parts = []
                 for t in textos:
                     txt = t.get_text(strip=True)
@@ -83,11 +172,11 @@ class ScraperSelenium:
                 if parts:
                     item["contenido"] = " ".join(parts)[:2000]
 
-                autor_elem = cont.find(class_=re.compile(r"author|byline|username", re.I))
+                autor_elem = indice.primero_con_clase(RE_AUTOR, dentro_de=cont)
                 if autor_elem:
                     item["autor"] = autor_elem.get_text(strip=True)
 
-                fecha_elem = cont.find(["time", "span"], class_=re.compile(r"date|time|posted", re.I))
+                fecha_elem = indice.primero_con_clase(RE_FECHA, dentro_de=cont, tags=("time", "span"))
                 if fecha_elem:
                     item["fecha"] = fecha_elem.get_text(strip=True)
 
@@ -104,9 +193,22 @@ class ScraperSelenium:
         except TimeoutException:
             print("⏰ Timeout cargando página con Selenium")
             return []
+        except WebDriverException as e:
+            print(f"❌ Error Selenium: {e}")
+            self.sano = self._driver_vivo()
+            return []
         except Exception as e:
             print(f"❌ Error Selenium: {e}")
             return []
+        finally:
+            self._limite = None
+
+    def _driver_vivo(self):
+        try:
+            self.driver.execute_script("return 1")
+            return True
+        except Exception:
+            return False
 
     def cerrar(self):
         try:
@@ -1,10 +1,29 @@
 from youtube_comment_downloader import YoutubeCommentDownloader
+import json
+import threading
 import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 import yt_dlp
 
+from utils.almacen_paginas import AlmacenPaginas
+from utils.limitador import CubetaTokens
+
 class ScraperYouTube:
-    def __init__(self):
-        self.downloader = YoutubeCommentDownloader()
+    def __init__(self, cliente=None, videos_por_segundo=2.0, cache_busquedas=None,
+                 ttl_busquedas=24 * 3600, estado=None):
+        self.cliente = cliente
+        # Checkpoints por video_id (utils.estado_incremental.EstadoIncremental)
+        self.estado = estado
+        # Resultados de ytsearch reutilizables entre ejecuciones (expiran con el TTL).
+        # Si no se pasa uno, se crea en la primera búsqueda (no al construir el scraper)
+        self._cache_busquedas = cache_busquedas
+        self.ttl_busquedas = ttl_busquedas
+        self._lock_cache = threading.Lock()
+        self.downloader = self._crear_downloader()
+        # Un downloader por hilo en modo paralelo (cada uno con su sesión y cookies)
+        self._local = threading.local()
+        # Ritmo global de arranque de videos cuando se scrapea en paralelo
+        self.limitador = CubetaTokens(tasa=videos_por_segundo, capacidad=2)
         self.ydl_opts = {
             'quiet': True,
             'no_warnings': True,
@@ -12,33 +31,83 @@ class ScraperYouTube:
             'skip_download': True
         }
 
-    def scrape_comentarios_video(self, video_id: str, max_comments: int = 300):
+    @property
+    def cache_busquedas(self):
+        with self._lock_cache:
+            if self._cache_busquedas is None:
+                self._cache_busquedas = AlmacenPaginas('cache_youtube', ttl=self.ttl_busquedas)
+            return self._cache_busquedas
+
+    def _crear_downloader(self):
+        downloader = YoutubeCommentDownloader()
+        # La sesión de la librería (con sus cookies) usa el pool compartido
+        if self.cliente is not None:
+            self.cliente.montar_en(downloader.session)
+        return downloader
+
+    def _downloader_hilo(self):
+        if not hasattr(self._local, 'downloader'):
+            self._local.downloader = self._crear_downloader()
+        return self._local.downloader
+
+    def scrape_comentarios_video(self, video_id: str, max_comments: int = 300, pausa: float = 0.5,
+                                 downloader=None, guardar_estado=True):
+        """
+        Con `estado`, si el video ya se scrapeó antes se piden los más recientes
+        primero y se corta al llegar a comentarios ya ingeridos.
+        """
         comentarios = []
+        vistos = self.estado.ids_vistos(video_id) if self.estado else set()
+        nuevos_ids = []
+        marca_agua = None
         try:
-            raw_comments = self.downloader.get_comments_from_url(
+            raw_comments = (downloader or self.downloader).get_comments_from_url(
                 f"https://www.youtube.com/watch?v={video_id}",
-                sort_by=0  # 0 = más populares primero
+                # 0 = más populares primero, 1 = más recientes (refresco incremental)
+                sort_by=1 if vistos else 0
             )
             count = 0
+            conocidos_seguidos = 0
             for comment in raw_comments:
                 if count >= max_comments:
                     break
+                cid = comment.get('cid', '')
+                if cid in vistos:
+                    # Un fijado puede salir primero aunque sea viejo: se corta
+                    # solo tras dos comentarios principales conocidos seguidos
+                    if not comment.get('reply'):
+                        conocidos_seguidos += 1
+                        if conocidos_seguidos >= 2:
+                            break
+                    continue
+                conocidos_seguidos = 0
+                nuevos_ids.append(cid)
+                if comment.get('time_parsed'):
+                    marca_agua = max(marca_agua or 0, comment['time_parsed'])
+
                 texto = comment.get('text', '').strip()
                 if len(texto) < 15:
                     continue
                 comentarios.append({
                     "texto": texto,
+                    "comentario_id": cid,
                     "autor": comment.get('author', 'Anónimo'),
                     "likes": comment.get('votes', 0),
-                    "url": f"https://www.youtube.com/watch?v={video_id}&lc={comment.get('cid', '')}",
+                    "url": f"https://www.youtube.com/watch?v={video_id}&lc={cid}",
                     "plataforma": "youtube",
                     "video_id": video_id
                 })
                 count += 1
             # Pequeño delay para ser amable con YouTube
-            time.sleep(0.5)
+            if pausa:
+                time.sleep(pausa)
         except Exception as e:
             print(f"Error scrapeando comentarios de {video_id}: {e}")
+
+        if self.estado and nuevos_ids:
+            self.estado.registrar(video_id, ids=nuevos_ids, marca_agua=marca_agua)
+            if guardar_estado:
+                self.estado.guardar()
         return comentarios
 
     def buscar_video_ids(self, query: str, limit: int = 10):
@@ -46,9 +115,14 @@ class ScraperYouTube:
         if not query.strip():
             print("   ⚠️ Keyword vacío, saltando")
             return []
+        search_query = f"ytsearch{limit}:{query.strip().lower()}"
+        en_cache = self.cache_busquedas.obtener(search_query)
+        if en_cache is not None:
+            video_ids = json.loads(en_cache)
+            print(f"   📂 {len(video_ids)} videos en cache para: '{query}'")
+            return video_ids
         try:
             with yt_dlp.YoutubeDL(self.ydl_opts) as ydl:
-                search_query = f"ytsearch{limit}:{query}"
                 info = ydl.extract_info(search_query, download=False)
                 entries = info.get('entries', [])
                 if not entries:
@@ -56,27 +130,117 @@ class ScraperYouTube:
                     return []
                 video_ids = [entry['id'] for entry in entries if entry.get('id')]
                 print(f"   Encontrados {len(video_ids)} videos para: '{query}'")
+                self.cache_busquedas.guardar(search_query, json.dumps(video_ids))
                 return video_ids
         except Exception as e:
             print(f"Error en búsqueda yt-dlp para '{query}': {e}")
             return []
 
-    def scrape_comentarios_keywords(self, keywords_list, max_videos_per_kw=6, max_comments_per_video=60):
+    def scrape_comentarios_keywords(self, keywords_list, max_videos_per_kw=6, max_comments_per_video=60,
+                                    max_workers=1):
+        """
+        Con max_workers > 1 usa un pool de hilos: todas las búsquedas a la vez
+        y los comentarios de cada video en cuanto su búsqueda termina.
+        Keywords repetidas se buscan una vez y cada video se scrapea
+        como mucho una vez por ejecución aunque salga en varias búsquedas.
+        """
+        keywords = self._keywords_unicas(keywords_list)
+        if max_workers > 1:
+            return self._scrape_keywords_paralelo(keywords, max_videos_per_kw,
+                                                  max_comments_per_video, max_workers)
         todos = []
-        for kw in keywords_list:
-            kw = kw.strip()
-            if not kw:
-                continue
+        videos_vistos = set()
+        for kw in keywords:
             print(f"\nBuscando videos para: '{kw}'")
             video_ids = self.buscar_video_ids(kw, limit=max_videos_per_kw * 2)  # Busca más para filtrar
             if not video_ids:
                 continue
 
             for vid in video_ids[:max_videos_per_kw]:
+                if vid in videos_vistos:
+                    print(f"   ↩️ Video {vid} ya scrapeado en esta ejecución")
+                    continue
+                videos_vistos.add(vid)
                 print(f"   Scrapeando comentarios de video: {vid}")
-                comentarios = self.scrape_comentarios_video(vid, max_comments_per_video)
+                comentarios = self.scrape_comentarios_video(vid, max_comments_per_video, guardar_estado=False)
                 todos.extend(comentarios)
                 print(f"   +{len(comentarios)} comentarios extraídos")
                 time.sleep(2)  # Respeto a YouTube
 
-        return todos
\ No newline at end of file
+        if self.estado:
+            self.estado.guardar()
+        return todos
+
+    def _keywords_unicas(self, keywords_list):
+        """Quita vacías y repetidas (sin distinguir mayúsculas/espacios), conserva el orden"""
+        unicas = {}
+        for kw in keywords_list:
+            kw = kw.strip()
+            if kw:
+                unicas.setdefault(' '.join(kw.lower().split()), kw)
+        return list(unicas.values())
+
+    def iterar_comentarios_keywords(self, keywords_list, max_videos_per_kw=6, max_comments_per_video=60,
+                                    max_workers=8):
+        """
+        Versión en streaming de scrape_comentarios_keywords: entrega la lista de
+        comentarios de cada video en cuanto termina, sin esperar al resto.
+        """
+        keywords = self._keywords_unicas(keywords_list)
+        for _, comentarios in self._iterar_keywords_paralelo(keywords, max_videos_per_kw,
+                                                             max_comments_per_video, max(1, max_workers)):
+            yield comentarios
+
+    def _scrape_keywords_paralelo(self, keywords, max_videos_per_kw, max_comments_per_video, max_workers):
+        """Worker pool con límite global de concurrencia (búsquedas + videos)"""
+        por_video = {}  # (indice_kw, indice_video) -> comentarios, para conservar el orden
+        for clave, comentarios in self._iterar_keywords_paralelo(keywords, max_videos_per_kw,
+                                                                 max_comments_per_video, max_workers):
+            por_video[clave] = comentarios
+
+        todos = []
+        for clave in sorted(por_video):
+            todos.extend(por_video[clave])
+        return todos
+
+    def _iterar_keywords_paralelo(self, keywords, max_videos_per_kw, max_comments_per_video, max_workers):
+        """Entrega ((indice_kw, indice_video), comentarios) según termina cada video"""
+        videos_vistos = set()
+
+        def scrape_video(vid):
+            self.limitador.adquirir()
+            comentarios = self.scrape_comentarios_video(
+                vid, max_comments_per_video, pausa=0, downloader=self._downloader_hilo(),
+                guardar_estado=False
+            )
+            print(f"   +{len(comentarios)} comentarios de video {vid}")
+            return comentarios
+
+        print(f"\n⚡ YouTube en paralelo: {len(keywords)} keywords, {max_workers} hilos")
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            busquedas = {
+                pool.submit(self.buscar_video_ids, kw, max_videos_per_kw * 2): i  # Busca más para filtrar
+                for i, kw in enumerate(keywords)
+            }
+            videos = {}
+            pendientes = set(busquedas)
+            try:
+                # Búsquedas y videos comparten la espera: los videos se encolan según termina
+                # cada búsqueda y sus comentarios salen en cuanto terminan, sin esperar al resto
+                while pendientes:
+                    hechos, pendientes = wait(pendientes, return_when=FIRST_COMPLETED)
+                    for futuro in hechos:
+                        if futuro not in busquedas:
+                            yield videos[futuro], futuro.result()
+                            continue
+                        i = busquedas[futuro]
+                        for j, vid in enumerate(futuro.result()[:max_videos_per_kw]):
+                            if vid in videos_vistos:
+                                continue
+                            videos_vistos.add(vid)
+                            nuevo = pool.submit(scrape_video, vid)
+                            videos[nuevo] = (i, j)
+                            pendientes.add(nuevo)
+            finally:
+                if self.estado:
+                    self.estado.guardar()
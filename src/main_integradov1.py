@@ -4,6 +4,7 @@ from langchain_openai import OpenAIEmbeddings
 import ollama
 import json
 import matplotlib
+import numpy as np
 from datetime import datetime
 #from dotenv import load_dotenv
 from rapidfuzz import fuzz, process
@@ -32,7 +33,11 @@ from scrapers.scraper_reddit import ScraperReddit
 from rag.rag_manager import RAGManager
 from scrapers.scraper_hibrido import ScraperHibrido
 from utils.downloader import DescargadorInteligente
+from utils.http_cliente import ClienteHTTP
+from utils.estado_incremental import EstadoIncremental
 from processors.normalizador import NormalizadorMVP
+from processors.deduplicacion import DeduplicadorIncremental, deduplicar_fuzzy, deduplicar_semantico
+from processors.pipeline_streaming import PipelineStreaming, VolcadoCrudos
 
 
 # Importar tu sistema existente
@@ -49,7 +54,9 @@ MODELO_OLLAMA = "llama3.1:8b"
 
 def analizar_con_ollama(rag_manager, stats=None, query="percepción general de Apple", modo="reporte", modelo=MODELO_OLLAMA):
     print("Buscando comentarios relevantes en RAG")
-    docs = rag_manager.buscar_relevantes(query, k=100 if modo == "reporte" else 100)
+    # Documentos + sus vectores guardados en una sola consulta (solo se embebe la query)
+    docs, vectores, _ = rag_manager.buscar_con_embeddings(query, k=100 if modo == "reporte" else 100)
+    vector_por_id = {doc.id: vector for doc, vector in zip(docs, vectores)}
     print(f"→ Recuperados {len(docs)} documentos (k=100)")
 
     # Deduplicación rápida por contenido (elimina comentarios idénticos)
@@ -67,18 +74,8 @@ def analizar_con_ollama(rag_manager, stats=None, query="percepción general de A
 
     try:
         def dedup_fuzzy_retrieval(docs_list, threshold=88):
-            texts = [d.page_content.strip() for d in docs_list]
-            unique = []
-            used = set()
-            for i, txt in enumerate(texts):
-                if i in used: continue
-                unique.append(docs_list[i])
-                if i + 1 < len(texts):
-                    matches = process.extract(txt, texts[i+1:], scorer=fuzz.token_sort_ratio, limit=None)
-                    for _, score, idx in matches:
-                        if score >= threshold:
-                            used.add(i + 1 + idx)
-            return unique
+            # Pocos documentos: camino exacto por lotes (cdist en C, todos los núcleos)
+            return deduplicar_fuzzy(docs_list, threshold=threshold, texto=lambda d: d.page_content)
 
         docs = dedup_fuzzy_retrieval(docs)
         print(f"→ Después de fuzzy en retrieval: {len(docs)} únicos")
@@ -88,21 +85,9 @@ def analizar_con_ollama(rag_manager, stats=None, query="percepción general de A
 
     # Deduplicación semántica (elimina comentarios muy similares)
     try:
-        embeddings = rag_manager.embeddings.embed_documents([d.page_content for d in docs])
-        import numpy as np
-        from sklearn.metrics.pairwise import cosine_similarity
-
-        unique_sem = []
-        used_sem = set()
-        for i, emb in enumerate(embeddings):
-            if i in used_sem: continue
-            unique_sem.append(docs[i])
-            sims = cosine_similarity([emb], embeddings[i+1:])[0]
-            for j, s in enumerate(sims):
-                if s >= 0.90:  
-                    used_sem.add(i + 1 + j)
-
-        docs = unique_sem
+        # Vectores recuperados junto a los documentos: sin volver a pasar por MiniLM
+        vectores = [vector_por_id[d.id] for d in docs]
+        docs = deduplicar_semantico(docs, vectores, umbral=0.90)
         print(f"→ Después semántica (threshold 0.90): {len(docs)} únicos")
     except Exception as e:
         print(f"⚠️ Semántica falló: {e}")
@@ -436,22 +421,37 @@ def main():
     rag = RAGManager(persist_directory=persist_dir)
     print(f"✅ RAG inicializado. Documentos actuales: {rag.get_total_documents()}")
     
-    # Inicializa scrapers
-    descargador = DescargadorInteligente(delay_min=4, delay_max=7)
+    # Inicializa scrapers (todos comparten el mismo pool de conexiones)
+    cliente_http = ClienteHTTP(pool_maxsize=32)
+    descargador = DescargadorInteligente(
+        delay_min=4,
+        delay_max=7,
+        # Índices de foros: se revalidan (304 si no cambiaron) cada media hora
+        max_age_por_patron={r"forums\.macrumors\.com/forums/": 1800},
+        cliente=cliente_http
+    )
     normalizador = NormalizadorMVP()
     scraper = ScraperHibrido(descargador, normalizador)
-    youtube_scraper = ScraperYouTube()
-    reddit_scraper = ScraperReddit()
+    youtube_scraper = ScraperYouTube(
+        cliente=cliente_http,
+        # Por video: IDs ya ingeridos → los refrescos solo traen comentarios nuevos
+        estado=EstadoIncremental("estado_youtube.json")
+    )
+    reddit_scraper = ScraperReddit(
+        cliente=cliente_http,
+        # Ritmo global de Reddit (todos los subreddits y workers): 4 req/s con ráfaga de 10.
+        # Bájalo si empiezan a aparecer 429
+        peticiones_por_segundo=4.0,
+        rafaga=10,
+        # Checkpoints por (subreddit, query): las siguientes ejecuciones solo traen lo nuevo
+        estado=EstadoIncremental("estado_reddit.json")
+    )
 
 
 
-    print("\n🚀 FASE 1: Web Scraping + YouTube")
+    print("\n🚀 FASE 1: Scraping + filtrado + indexado en streaming (web, YouTube, Reddit)")
     print("=" * 40)
 
-    # INICIALIZAR lista vacía ANTES de cualquier scraping
-
-    todos_datos = []
-
     # 1. Scraping web tradicional
     urls = [
     # Blogs con comunidad activa (comentarios)
@@ -466,19 +466,14 @@ def main():
     "https://forums.macrumors.com/forums/ipad.122/",
 ]
 
+    def fuente_web():
+        # Pre-descarga en paralelo: cada host mantiene su ritmo, los scrapers leen del cache
+        descargador.descargar_muchos(urls)
+        # Cada URL entra al pipeline en cuanto termina; las que necesiten JS comparten el pool de navegadores
+        for url, datos in scraper.iterar_muchos(urls):
+            print(f"   📄 Web {url}: {len(datos)} elementos")
+            yield datos
 
-    for i, url in enumerate(urls, 1):
-        print(f"\n📄 [{i}/{len(urls)}] Scrapeando web: {url}")
-        datos = scraper.scrape(url)
-        if datos:
-            todos_datos.extend(datos)
-            print(f"   ✅ Extraídos {len(datos)} elementos web")
-   
-    
-   
-    # 2. Scraping YouTube
-    print("\n🚀 FASE 1.5: Scraping YouTube Comments")
-    print("=" * 40)
 
     youtube_keywords = [
     # Reviews reales
@@ -523,26 +518,14 @@ def main():
 ]
 
 
-    comentarios_yt = youtube_scraper.scrape_comentarios_keywords(
-        keywords_list=youtube_keywords,
-        max_videos_per_kw=4,          # 8 videos por keyword
-        max_comments_per_video=10     # Hasta 100 comentarios por video
-    )
-
-    todos_datos.extend(comentarios_yt)
-
-    total_yt = len(comentarios_yt)
-    print(f"\n✅ Total comentarios extraídos de YouTube: {total_yt}")
-
-    if total_yt == 0:
-        print("\n⚠️ No se extrajeron comentarios de YouTube. Continuando con otras fuentes...")
-    else:
-        print(f"   Promedio aproximado por keyword: {total_yt // len(youtube_keywords)} comentarios")
-
-    # Continúa con el resto
-    print(f"\n💾 Total elementos scrapeados hasta ahora: {len(todos_datos)} (web + YouTube)")
-    print("\n🚀 FASE 1.6: Scraping TikTok Comments")
-    print("=" * 40)
+    def fuente_youtube():
+        # Los comentarios de cada video entran al pipeline en cuanto se descargan
+        yield from youtube_scraper.iterar_comentarios_keywords(
+            keywords_list=youtube_keywords,
+            max_videos_per_kw=4,          # 8 videos por keyword
+            max_comments_per_video=10,    # Hasta 100 comentarios por video
+            max_workers=8                 # Búsquedas y videos en paralelo
+        )
 
 
     """
@@ -615,61 +598,20 @@ def main():
     )
 }
 
-
-
-
-    for sub, query in subreddits_queries.items():
-        print(f"   🔍 Scrapeando r/{sub}")
-        datos = reddit_scraper.scrape_subreddit(
-            subreddit=sub,
-            query=query,
+    def fuente_reddit():
+        # Todos los subreddits a la vez, bajo el mismo limitador de Reddit
+        print(f"   🔍 Scrapeando {len(subreddits_queries)} subreddits en paralelo")
+        for sub, datos in reddit_scraper.iterar_varios(
+            subreddits_queries,
             limit=100,  # Máximo 100 posts por subreddit
-        )
-        if datos:
-            todos_datos.extend(datos)
-            print(f"   ✅ {len(datos)} comentarios extraídos de r/{sub}")
-        else:
-            print(f"   ⚠️ Sin resultados en r/{sub}")
-
+        ):
+            if datos:
+                print(f"   ✅ {len(datos)} comentarios extraídos de r/{sub}")
+            else:
+                print(f"   ⚠️ Sin resultados en r/{sub}")
+            yield datos
 
-   
-
-    print(f"   Total acumulado hasta ahora: {len(todos_datos)} elementos")
-   
-    unique = {item.get('texto', '').strip(): item for item in todos_datos if item.get('texto')}
-    todos_datos = list(unique.values())
-    print(f"Después de dedup exacta: {len(todos_datos)} elementos")
 
-    # Ahora la fuzzy (la importante)
- 
-
-    def deduplicar_fuzzy(items, threshold=90):
-        textos = [item.get('texto', '').strip() for item in items]
-        unique = []
-        usados = set()
-
-        for i, texto in enumerate(textos):
-            if i in usados or not texto:
-                continue
-            unique.append(items[i])
-            if i + 1 < len(textos):
-                matches = process.extract(
-                    texto,
-                    textos[i+1:],
-                    scorer=fuzz.token_sort_ratio,
-                    limit=None
-                )
-                for _, score, rel_idx in matches:
-                    if score >= threshold:
-                        usados.add(i + 1 + rel_idx)
-
-        print(f"Deduplicación fuzzy ({threshold}%): {len(items)} → {len(unique)} elementos")
-        return unique
-
-     
-    todos_datos = deduplicar_fuzzy(todos_datos, threshold=90)
-    print(f"Total después de fuzzy + exacta: {len(todos_datos)} elementos")
-    print(f"Reducción por fuzzy: {len(unique) - len(todos_datos)} elementos eliminados")
     """
     # Scraper Instagram
     print("\n🚀 FASE 1.8: Scraping Instagram Comments (perfiles públicos)")
@@ -736,59 +678,38 @@ def main():
     # Uso
     todos_datos = deduplicar_mejorado(todos_datos, threshold=90)
     """
-    print(f"Después de dedup: {len(todos_datos)} elementos")
-    comentarios_validos = []
-        # ───────────────────────────────────────────────────────────────
+
+    # ───────────────────────────────────────────────────────────────
     #          GUARDAR TODOS LOS DATOS SCRAPEADOS PARA INSPECCIÓN
     # ───────────────────────────────────────────────────────────────
-
-    print("\n💾 Guardando datos scrapeados crudos para revisión...")
+    # Se escriben a disco según llegan (ya deduplicados), sin acumularlos en memoria
 
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-
-    # 1. Versión JSON completa y bonita (fácil de abrir con editor o navegador)
     json_path = f"datos_scrapeados_crudos_{timestamp}.json"
-    with open(json_path, "w", encoding="utf-8") as f:
-        json.dump(todos_datos, f, ensure_ascii=False, indent=2, default=str)
-    print(f"   → JSON completo: {json_path}  ({len(todos_datos):,} elementos)")
-
-    # 2. Versión texto plano muy legible (ideal para revisar con ojos humanos)
     txt_path = f"datos_scrapeados_crudos_{timestamp}.txt"
-    with open(txt_path, "w", encoding="utf-8") as f:
-        f.write(f"ARCHIVO DE DATOS SCRAPEADOS - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-        f.write(f"Total elementos scrapeados: {len(todos_datos)}\n")
-        f.write("=" * 80 + "\n\n")
+    volcado = VolcadoCrudos(json_path, txt_path)
 
-        for i, item in enumerate(todos_datos, 1):
-            f.write(f"┌─── ELEMENTO #{i} ───────────────────────────────────────┐\n")
-            
-            # Texto principal (el más importante)
-            texto = item.get("texto") or item.get("contenido") or item.get("text") or "(sin texto)"
-            f.write(f"TEXTO:\n{texto}\n\n")
-            
-            # Metadatos clave
-            campos_interesantes = [
-                ("Plataforma", item.get("plataforma") or item.get("source") or "—"),
-                ("URL", item.get("url") or item.get("video_url") or "—"),
-                ("Autor", item.get("autor") or item.get("author") or item.get("username") or "—"),
-                ("Fecha", item.get("fecha") or item.get("date") or item.get("published_at") or "—"),
-                ("Tipo", item.get("tipo") or "—")
-            ]
-            
-            for nombre, valor in campos_interesantes:
-                if valor and valor != "—":
-                    f.write(f"{nombre:12}: {valor}\n")
-            
-            f.write("└────────────────────────────────────────────────────────────┘\n\n")
+    # Dedup exacta + fuzzy incremental: un item se queda si no se parece a ninguno de los ya
+    # conservados. Los parecidos se buscan con MinHash/LSH (recall aproximado: algún
+    # casi-duplicado con poco solapamiento puede colarse); usar_lsh=False es exacto pero O(n²).
+    # La etapa recibe los items de uno en uno, por eso no usa el camino por lotes con cdist
+    # (deduplicar_fuzzy / agregar_lote exacto), pensado para listas o lotes ya completos
+    deduplicador = DeduplicadorIncremental(threshold=90)
+
+    # En memoria solo queda la muestra para Ragas (límite razonable para no gastar demasiado)
+    muestra_ragas = []
+    MAX_MUESTRA_RAGAS = 800
+
+    def etapa_dedup(item):
+        texto = item.get("texto") or item.get("contenido") or ""
+        if not deduplicador.agregar(texto):
+            return None
+        volcado.escribir(item)
+        return item
+
+    def etapa_clasificar(item):
+        es_valido = False
 
-    print(f"   → TXT legible: {txt_path}")
-    print("   ¡Listo! Abre cualquiera de los dos archivos para revisar los datos crudos.\n")
-    
-    
-   
-        
-    
-    for item in todos_datos:
         stats_pipeline["total_scrapeados"] += 1
 
         texto = item.get("texto") or item.get("contenido") or item.get("text") or ""
@@ -797,7 +718,7 @@ def main():
         # Filtro 1: Vacíos/cortos
         if not texto or len(texto) < 30:
             stats_pipeline["descartados_cortos"] += 1
-            continue
+            return None
 
         # Filtro 2: Ruido de headers/menús (patrones específicos de MacRumors/foros)
         ruido_patterns = [
@@ -819,7 +740,7 @@ def main():
         """ 
         if tipo == "ruido":
             stats_pipeline["descartados_ruido"] += 1
-            continue
+            return None
         """
   
 
@@ -839,7 +760,7 @@ def main():
         tipo = clasificar_texto(texto)
         if tipo == "ruido":
             stats_pipeline["descartados_ruido"] += 1
-            continue
+            return None
 
         # 🔹 Válidos
         item["tipo"] = tipo
@@ -849,7 +770,9 @@ def main():
             stats_globales["opinion"] += 1
             item["tipo_fuente"] = "opinion_real"
             item["longitud_texto"] = len(texto)
-            comentarios_validos.append(item)
+            es_valido = True
+            if len(muestra_ragas) < MAX_MUESTRA_RAGAS:
+                muestra_ragas.append(item)
         else:
             stats_globales["informativo"] += 1
 
@@ -857,6 +780,39 @@ def main():
         # 🔹 Conteo para preguntas tipo “Reddit vs YouTube”
         fuentes_stats[plataforma] = fuentes_stats.get(plataforma, 0) + 1
 
+        return item if es_valido else None
+
+    def indexar(lote):
+        # El RAG embebe e indexa por lotes mientras los scrapers siguen descargando
+        rag.agregar_comentarios(lote, batch_size=len(lote))
+
+    pipeline = PipelineStreaming(tam_cola=1000)
+    pipeline.fuente("web", fuente_web).fuente("youtube", fuente_youtube).fuente("reddit", fuente_reddit)
+    pipeline.etapa("dedup", etapa_dedup).etapa("clasificar", etapa_clasificar)
+    pipeline.sumidero("rag", indexar, tam_lote=256)
+    try:
+        pipeline.ejecutar()
+    finally:
+        volcado.cerrar()
+        # El pool de navegadores solo lo usa la fuente web: no dejar procesos colgados
+        scraper.cerrar_selenium()
+    pipeline.resumen()
+
+    dedup_stats = deduplicador.stats
+    print(f"Deduplicación exacta + fuzzy (90%): {dedup_stats['vistos']} → {dedup_stats['unicos']} elementos "
+          f"({dedup_stats['duplicados_exactos']} exactos, {dedup_stats['duplicados_fuzzy']} fuzzy)")
+
+    # Casi-duplicados semánticos en todo el corpus (incluye lo de ejecuciones anteriores),
+    # con los embeddings ya guardados en Chroma. Solo informe: con eliminar=True se borran
+    # de la base persistida
+    rag.deduplicar_corpus(umbral=0.90)
+
+    print("\n💾 Datos scrapeados crudos guardados para revisión:")
+    print(f"   → JSON completo: {json_path}  ({volcado.total:,} elementos)")
+    print(f"   → TXT legible: {txt_path}")
+    print("   ¡Listo! Abre cualquiera de los dos archivos para revisar los datos crudos.\n")
+
+
     total = sum(plataforma_stats.values())
 
     for plataforma, count in plataforma_stats.items():
@@ -870,8 +826,7 @@ def main():
     print("\n📊 Preparando muestra para evaluación con Ragas...")
 
     # Usamos comentarios válidos (después de filtrado) para mayor calidad
-    # Si quieres usar TODO lo crudo, cambia a: datos_para_ragas = todos_datos[:800]
-    datos_para_ragas = comentarios_validos[:800]  # límite razonable para no gastar demasiado
+    datos_para_ragas = muestra_ragas
 
     if datos_para_ragas:
         ragas_samples = []
@@ -887,8 +842,8 @@ def main():
 
         ragas_output = {
             "generated_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            "total_original_scraped": len(todos_datos),
-            "total_after_filter": len(comentarios_validos),
+            "total_original_scraped": stats_pipeline["total_scrapeados"],
+            "total_after_filter": stats_globales["opinion"],
             "sample_for_ragas": ragas_samples
         }
 
@@ -952,13 +907,11 @@ def main():
         stats_globales["informativo_pct"] = 0
     
 
-    print("📊 Agregando comentarios válidos al RAG...")
-    rag.agregar_comentarios(comentarios_validos)
-    print(f"✅ Comentarios válidos procesados: {len(comentarios_validos)}")
+    print(f"✅ Comentarios válidos procesados: {stats_globales['opinion']}")
         
         # VERIFICACIÓN CRÍTICA:
     print(f"\n🔍 VERIFICACIÓN RAG:")
-    print(f"   - Comentarios procesados: {len(comentarios_validos)}")
+    print(f"   - Comentarios procesados: {stats_globales['opinion']}")
     print(f"   - Documentos en RAG: {rag.get_total_documents()}")
     print(f"   - Guardado en: {rag.persist_directory}")
         
@@ -1023,18 +976,13 @@ def main():
     )
 
 
-    total = len(todos_datos)
-    opiniones = sum(1 for c in todos_datos if c.get("tipo") == "opinion")
-    informativos = total - opiniones
+    total = stats_pipeline["total_scrapeados"]
 
 
     if total == 0:
         print("⚠️ No hay opiniones reales suficientes para métricas")
     else:
-        opiniones = sum(
-            1 for c in comentarios_validos 
-            if c["tipo"] in ["opinion", "opinion_negativa"]
-        )
+        opiniones = stats_globales["opinion"]
         informativos = total - opiniones
 
         print(f"""
@@ -1153,7 +1101,4 @@ if __name__ == "__main__":
         print(f"\n❌ Error crítico: {e}")
         import traceback
         traceback.print_exc()
-    finally:
-        if 'scraper' in locals() and hasattr(scraper, 'cerrar_selenium'):
-            scraper.cerrar_selenium()
      
\ No newline at end of file
@@ -1,4 +1,12 @@
 
 from .downloader import DescargadorInteligente
+from .almacen_paginas import AlmacenPaginas
+from .http_cliente import ClienteHTTP
+from .limitador import CubetaTokens, LimitadorPorHost
+from .reintentos import PoliticaReintentos, InterruptorCircuito
+from .estado_incremental import EstadoIncremental
+from .parseo import parsear_html, DocumentoPagina, IndiceClases
 
-__all__ = ['DescargadorInteligente']
\ No newline at end of file
+__all__ = ['DescargadorInteligente', 'AlmacenPaginas', 'ClienteHTTP', 'CubetaTokens', 'LimitadorPorHost',
+           'PoliticaReintentos', 'InterruptorCircuito', 'EstadoIncremental', 'parsear_html', 'DocumentoPagina',
+           'IndiceClases']
\ No newline at end of file
@@ -0,0 +1,199 @@
+# utils/almacen_paginas.py
+import gzip
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+class AlmacenPaginas:
+    """
+    Cache en disco de páginas descargadas.
+    Un blob gzip por URL (nombre = hash de la URL, repartido en subcarpetas)
+    más un índice SQLite pequeño con la fecha de descarga, el tamaño y los
+    validadores HTTP (ETag / Last-Modified) para revalidar con requests condicionales.
+    Escribir una página es O(1) y el HTML solo se lee cuando se pide.
+    """
+
+    def __init__(self, directorio='cache_paginas', ttl=None, max_bytes=None):
+        self.directorio = directorio
+        self.ttl = ttl                # segundos; None = no expira
+        self.max_bytes = max_bytes    # tamaño máximo de blobs; None = sin límite
+        os.makedirs(self.directorio, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(
+            os.path.join(self.directorio, 'indice.sqlite'),
+            check_same_thread=False
+        )
+        self._db.execute(
+            """CREATE TABLE IF NOT EXISTS paginas (
+                   url TEXT PRIMARY KEY,
+                   clave TEXT NOT NULL,
+                   fecha REAL NOT NULL,
+                   tamano INTEGER NOT NULL,
+                   etag TEXT,
+                   last_modified TEXT
+               )"""
+        )
+        # Índices creados por versiones anteriores no tienen los validadores
+        columnas = {fila[1] for fila in self._db.execute("PRAGMA table_info(paginas)")}
+        for columna in ('etag', 'last_modified'):
+            if columna not in columnas:
+                self._db.execute(f"ALTER TABLE paginas ADD COLUMN {columna} TEXT")
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_paginas_fecha ON paginas(fecha)")
+        self._db.commit()
+
+        self._total_bytes = self._db.execute(
+            "SELECT COALESCE(SUM(tamano), 0) FROM paginas"
+        ).fetchone()[0]
+        self.evictar()
+
+    def __contains__(self, url):
+        # Solo el índice (y el TTL): no hace falta descomprimir el blob
+        return self.obtener_entrada(url) is not None
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM paginas").fetchone()[0]
+
+    def obtener_entrada(self, url):
+        """
+        Devuelve los metadatos de una URL sin leer el HTML:
+        {'fecha', 'etag', 'last_modified'} o None si no existe / expiró
+        """
+        with self._lock:
+            fila = self._db.execute(
+                "SELECT fecha, etag, last_modified FROM paginas WHERE url = ?", (url,)
+            ).fetchone()
+        if not fila:
+            return None
+
+        fecha, etag, last_modified = fila
+        if self.ttl is not None and time.time() - fecha > self.ttl:
+            self.eliminar(url)
+            return None
+        return {'fecha': fecha, 'etag': etag, 'last_modified': last_modified}
+
+    def obtener(self, url):
+        """Devuelve el HTML guardado o None si no existe / expiró"""
+        if self.obtener_entrada(url) is None:
+            return None
+
+        try:
+            with gzip.open(self._ruta_blob(self._clave(url)), 'rt', encoding='utf-8') as f:
+                return f.read()
+        except (OSError, EOFError):
+            # Blob perdido o corrupto: se limpia la entrada del índice
+            self.eliminar(url)
+            return None
+
+    def guardar(self, url, html, etag=None, last_modified=None):
+        """Guarda (o reemplaza) el HTML de una URL junto a sus validadores HTTP"""
+        clave = self._clave(url)
+        ruta = self._ruta_blob(clave)
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+
+        # Escritura atómica: tmp + replace
+        tmp = f"{ruta}.{threading.get_ident()}.tmp"
+        with gzip.open(tmp, 'wt', encoding='utf-8', compresslevel=6) as f:
+            f.write(html)
+        os.replace(tmp, ruta)
+        tamano = os.path.getsize(ruta)
+
+        with self._lock:
+            anterior = self._db.execute(
+                "SELECT tamano FROM paginas WHERE url = ?", (url,)
+            ).fetchone()
+            self._db.execute(
+                "INSERT OR REPLACE INTO paginas (url, clave, fecha, tamano, etag, last_modified) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (url, clave, time.time(), tamano, etag, last_modified)
+            )
+            self._db.commit()
+            self._total_bytes += tamano - (anterior[0] if anterior else 0)
+            excedido = self.max_bytes is not None and self._total_bytes > self.max_bytes
+
+        if excedido:
+            self.evictar()
+
+    def refrescar(self, url):
+        """Marca una entrada como recién validada (respuesta 304) sin reescribir el blob"""
+        with self._lock:
+            self._db.execute("UPDATE paginas SET fecha = ? WHERE url = ?", (time.time(), url))
+            self._db.commit()
+
+    def eliminar(self, url):
+        """Borra una URL del índice y su blob"""
+        with self._lock:
+            fila = self._db.execute(
+                "SELECT clave, tamano FROM paginas WHERE url = ?", (url,)
+            ).fetchone()
+            if not fila:
+                return
+            self._db.execute("DELETE FROM paginas WHERE url = ?", (url,))
+            self._db.commit()
+            self._total_bytes -= fila[1]
+        self._borrar_blob(fila[0])
+
+    def evictar(self):
+        """Elimina entradas expiradas por TTL y las más antiguas si se supera max_bytes"""
+        borrar = []
+        with self._lock:
+            if self.ttl is not None:
+                limite = time.time() - self.ttl
+                borrar += self._db.execute(
+                    "SELECT url, clave, tamano FROM paginas WHERE fecha < ?", (limite,)
+                ).fetchall()
+                self._db.execute("DELETE FROM paginas WHERE fecha < ?", (limite,))
+                self._total_bytes -= sum(f[2] for f in borrar)
+
+            if self.max_bytes is not None and self._total_bytes > self.max_bytes:
+                # Se libera hasta el 90% del límite para no evictar en cada escritura
+                objetivo = self.max_bytes * 0.9
+                for url, clave, tamano in self._db.execute(
+                    "SELECT url, clave, tamano FROM paginas ORDER BY fecha ASC"
+                ).fetchall():
+                    if self._total_bytes <= objetivo:
+                        break
+                    self._db.execute("DELETE FROM paginas WHERE url = ?", (url,))
+                    self._total_bytes -= tamano
+                    borrar.append((url, clave, tamano))
+            self._db.commit()
+
+        for _, clave, _ in borrar:
+            self._borrar_blob(clave)
+        if borrar:
+            print(f"🧹 Cache: {len(borrar)} páginas evictadas")
+
+    def importar_json(self, ruta_json):
+        """Migra el antiguo cache_descargas.json ({url: html}) al almacén"""
+        try:
+            with open(ruta_json, 'r') as f:
+                antiguo = json.load(f)
+        except (OSError, ValueError):
+            return 0
+        for url, html in antiguo.items():
+            if html:
+                self.guardar(url, html)
+        print(f"📦 Migradas {len(antiguo)} páginas desde {ruta_json}")
+        return len(antiguo)
+
+    def cerrar(self):
+        with self._lock:
+            self._db.close()
+
+    def _clave(self, url):
+        return hashlib.sha1(url.encode('utf-8')).hexdigest()
+
+    def _ruta_blob(self, clave):
+        # Subcarpeta por prefijo del hash para no tener miles de archivos en una sola
+        return os.path.join(self.directorio, clave[:2], f"{clave}.html.gz")
+
+    def _borrar_blob(self, clave):
+        try:
+            os.remove(self._ruta_blob(clave))
+        except OSError:
+            pass
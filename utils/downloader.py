@@ -2,19 +2,38 @@
 import requests
 import time
 import random
+import re
 from urllib.parse import urlparse
-import json
 import os
+from concurrent.futures import ThreadPoolExecutor
+
+from .almacen_paginas import AlmacenPaginas
+from .http_cliente import ClienteHTTP
+from .limitador import LimitadorPorHost
+from .parseo import DocumentoPagina
+from .reintentos import InterruptorCircuito, PoliticaReintentos
 
 class DescargadorInteligente:
     """
     Descargador con técnicas anti-bloqueo para sitios de Apple
     """
     
-    def __init__(self, delay_min=3, delay_max=7):
+    # Respuestas que merecen otro intento con backoff
+    CODIGOS_REINTENTABLES = (429, 500, 502, 503, 504)
+    
+    def __init__(self, delay_min=3, delay_max=7, cache_dir='cache_paginas',
+                 cache_ttl=7 * 24 * 3600, cache_max_mb=512,
+                 max_age_por_patron=None, max_age_defecto=None,
+                 politica_reintentos=None, circuito=None, cliente=None):
         self.delay_min = delay_min
         self.delay_max = delay_max
-        self.ultimo_request = 0
+        
+        # Delays de cortesía por dominio (token bucket), no globales
+        self.limitador = LimitadorPorHost(delay_min, delay_max)
+        
+        # Reintentos acotados + circuit breaker por host
+        self.politica_reintentos = politica_reintentos or PoliticaReintentos()
+        self.circuito = circuito or InterruptorCircuito()
         
         # Pool de User-Agents realistas
         self.user_agents = [
@@ -39,49 +58,79 @@ class DescargadorInteligente:
             'Cache-Control': 'max-age=0'
         }
         
-        self.session = requests.Session()
+        # Pool de conexiones compartido (puede venir de fuera para reutilizarlo)
+        self.cliente = cliente or ClienteHTTP()
+        self.session = self.cliente.session
         
-        # Cache para no repetir descargas
-        self.cache_file = 'cache_descargas.json'
-        self.cache = self._cargar_cache()
+        # Cache en disco para no repetir descargas (un blob por URL + índice)
+        self.cache_file = 'cache_descargas.json'  # formato antiguo, solo para migrar
+        self.cache = self._cargar_cache(cache_dir, cache_ttl, cache_max_mb)
+        
+        # Frescura: {regex de URL: segundos}. Pasado ese tiempo se revalida con
+        # If-None-Match / If-Modified-Since. None = la copia en cache nunca caduca
+        self.max_age_defecto = max_age_defecto
+        self.max_age_por_patron = [
+            (re.compile(patron), segundos)
+            for patron, segundos in (max_age_por_patron or {}).items()
+        ]
     
     def descargar(self, url, usar_cache=True):
         """
         Descarga inteligente con cache y anti-bloqueo
         """
         # Verificar cache primero
-        if usar_cache and url in self.cache:
-            print(f"📂 Usando cache para: {self._acortar_url(url)}")
-            return self.cache[url]
-        
-        # Respetar delay aleatorio
-        self._delay_aleatorio()
+        entrada = self.cache.obtener_entrada(url) if usar_cache else None
+        if entrada and self._es_fresca(url, entrada):
+            html = self.cache.obtener(url)
+            if html is not None:
+                print(f"📂 Usando cache para: {self._acortar_url(url)}")
+                return html
         
-        # Headers dinámicos
-        headers = self.headers_base.copy()
-        headers['User-Agent'] = random.choice(self.user_agents)
-        
-        # Referer aleatorio (opcional, hace parecer tráfico orgánico)
-        if random.random() > 0.5:
-            headers['Referer'] = 'https://www.google.com/'
+        host = urlparse(url).netloc
+        politica = self.politica_reintentos
         
-        try:
-            print(f"🌐 Descargando: {self._acortar_url(url)}")
+        # Bucle acotado de intentos (sin recursión ni esperas fijas)
+        for intento in range(1, politica.max_intentos + 1):
+            if not self.circuito.permite(host):
+                print(f"🔌 Circuito abierto para {host}, se omite: {self._acortar_url(url)}")
+                return None
             
-            # Request con timeout y verificación SSL
-            response = self.session.get(
-                url,
-                headers=headers,
-                timeout=15,
-                verify=True,  # IMPORTANTE: True para Apple
-                allow_redirects=True
-            )
+            # Respetar delay aleatorio del host (incluye backoff pendiente)
+            self._delay_aleatorio(url)
+            
+            try:
+                print(f"🌐 Descargando: {self._acortar_url(url)}")
+                response = self._get_navegador(url, entrada)
+                
+                if response.status_code == 304 and entrada:
+                    self.circuito.registrar_exito(host)
+                    html = self.cache.obtener(url)
+                    if html is not None:
+                        print(f"♻️ Sin cambios (304), usando cache: {self._acortar_url(url)}")
+                        self.cache.refrescar(url)
+                        return html
+                    # El blob desapareció entre medias: se pide completa en este mismo intento
+                    entrada = None
+                    response = self._get_navegador(url)
+                
+            except requests.exceptions.SSLError:
+                print(f"🔒 Error SSL (posible WAF). Intentando sin verificación...")
+                return self._descargar_sin_ssl(url)
+            
+            except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
+                print(f"⏰ {type(e).__name__} en intento {intento}/{politica.max_intentos}")
+                self._programar_reintento(url, host, intento)
+                continue
+            
+            except Exception as e:
+                print(f"❌ Error: {type(e).__name__} - {e}")
+                return None
             
             # Manejar códigos de estado
-            if response.status_code == 429:  # Too Many Requests
-                print(f"⏸️ Rate limit detectado, esperando 30s...")
-                time.sleep(30)
-                return self.descargar(url, usar_cache=False)
+            if response.status_code in self.CODIGOS_REINTENTABLES:
+                print(f"⏸️ Código {response.status_code} (intento {intento}/{politica.max_intentos})")
+                self._programar_reintento(url, host, intento, response.headers.get('Retry-After'))
+                continue
             
             elif response.status_code == 403:  # Forbidden
                 print(f"🚫 Acceso denegado (403). Probando con headers diferentes...")
@@ -91,37 +140,106 @@ class DescargadorInteligente:
                 print(f"⚠️ Código {response.status_code} para {self._acortar_url(url)}")
                 return None
             
+            self.circuito.registrar_exito(host)
+            
             # Guardar en cache
-            self.cache[url] = response.text
-            self._guardar_cache()
+            self.cache.guardar(
+                url,
+                response.text,
+                etag=response.headers.get('ETag'),
+                last_modified=response.headers.get('Last-Modified')
+            )
             
-            self.ultimo_request = time.time()
             return response.text
-            
-        except requests.exceptions.SSLError:
-            print(f"🔒 Error SSL (posible WAF). Intentando sin verificación...")
-            return self._descargar_sin_ssl(url)
         
-        except requests.exceptions.Timeout:
-            print(f"⏰ Timeout. Reintentando...")
-            time.sleep(5)
-            return self.descargar(url, usar_cache=False)
+        print(f"❌ Sin éxito tras {politica.max_intentos} intentos: {self._acortar_url(url)}")
+        return None
+    
+    def _get_navegador(self, url, entrada=None):
+        """GET con headers de navegador (y validadores si hay copia caducada)"""
+        # Headers dinámicos
+        headers = self.headers_base.copy()
+        headers['User-Agent'] = random.choice(self.user_agents)
         
-        except Exception as e:
-            print(f"❌ Error: {type(e).__name__} - {e}")
-            return None
+        # Referer aleatorio (opcional, hace parecer tráfico orgánico)
+        if random.random() > 0.5:
+            headers['Referer'] = 'https://www.google.com/'
+        
+        # Copia caducada: pedir solo si cambió (304 = sin cuerpo)
+        if entrada:
+            if entrada.get('etag'):
+                headers['If-None-Match'] = entrada['etag']
+            if entrada.get('last_modified'):
+                headers['If-Modified-Since'] = entrada['last_modified']
+        
+        # Request con timeout y verificación SSL
+        return self.cliente.get(
+            url,
+            headers=headers,
+            timeout=15,
+            verify=True,  # IMPORTANTE: True para Apple
+            allow_redirects=True
+        )
     
-    def _delay_aleatorio(self):
-        """Delay aleatorio entre requests"""
-        tiempo_actual = time.time()
-        tiempo_pasado = tiempo_actual - self.ultimo_request
-        
-        if tiempo_pasado < self.delay_min:
-            delay = random.uniform(self.delay_min, self.delay_max)
-            espera = delay - tiempo_pasado
-            if espera > 0:
-                print(f"⏳ Delay aleatorio: {espera:.1f}s")
-                time.sleep(espera)
+    def _programar_reintento(self, url, host, intento, retry_after=None):
+        """
+        Registra el fallo y aplaza el siguiente turno del host según la política.
+        La espera la hace _delay_aleatorio, así otros hilos del mismo host también la respetan.
+        """
+        if self.circuito.registrar_fallo(host):
+            print(f"🔌 {host} falla repetidamente, circuito abierto {self.circuito.enfriamiento}s")
+        if intento >= self.politica_reintentos.max_intentos:
+            return
+        espera = self.politica_reintentos.calcular_espera(intento, retry_after)
+        self.politica_reintentos.registrar_espera(host, espera)
+        self.limitador.cubeta(url).pausar(espera)
+        print(f"   ↻ Backoff {espera:.1f}s antes de reintentar")
+    
+    def obtener_documento(self, url, usar_cache=True):
+        """Descarga la URL y la envuelve en un DocumentoPagina (parseo perezoso y único)"""
+        html = self.descargar(url, usar_cache=usar_cache)
+        return DocumentoPagina(url, html) if html else None
+    
+    def descargar_muchos(self, urls, usar_cache=True, max_workers=8):
+        """
+        Descarga varias URLs en paralelo con un pool de hilos.
+        Cada host sigue respetando su propio ritmo (token bucket por dominio).
+        Devuelve dict {url: html o None} en el mismo orden de entrada.
+        """
+        urls = list(dict.fromkeys(urls))  # sin duplicados, conserva orden
+        if not urls:
+            return {}
+        
+        workers = max(1, min(max_workers, len(urls)))
+        print(f"🚀 Descargando {len(urls)} URLs en paralelo ({workers} hilos)")
+        
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            htmls = dict(zip(urls, pool.map(lambda u: self.descargar(u, usar_cache=usar_cache), urls)))
+        
+        metricas = self.politica_reintentos.resumen()
+        if metricas['reintentos']:
+            print(f"📈 Reintentos: {metricas['reintentos']} · "
+                  f"{metricas['segundos_esperando']}s esperando · por host: {metricas['por_host']}")
+        return htmls
+    
+    def _delay_aleatorio(self, url):
+        """Delay aleatorio entre requests al mismo host"""
+        espera = self.limitador.cubeta(url).reservar()
+        if espera > 0:
+            print(f"⏳ Delay aleatorio ({urlparse(url).netloc}): {espera:.1f}s")
+            time.sleep(espera)
+    
+    def _max_age(self, url):
+        """Segundos de frescura para la URL según el primer patrón que coincida"""
+        for patron, segundos in self.max_age_por_patron:
+            if patron.search(url):
+                return segundos
+        return self.max_age_defecto
+    
+    def _es_fresca(self, url, entrada):
+        """True si la copia en cache puede usarse sin revalidar"""
+        max_age = self._max_age(url)
+        return max_age is None or time.time() - entrada['fecha'] <= max_age
     
     def _intentar_con_headers_alternativos(self, url):
         """Intenta con diferentes headers cuando hay bloqueo"""
@@ -133,7 +251,7 @@ class DescargadorInteligente:
         }
         
         try:
-            response = requests.get(url, headers=headers_mobile, timeout=10)
+            response = self.cliente.get(url, headers=headers_mobile, timeout=10)
             if response.status_code == 200:
                 print("✅ Desbloqueado con headers móviles")
                 return response.text
@@ -145,28 +263,18 @@ class DescargadorInteligente:
     def _descargar_sin_ssl(self, url):
         """Último recurso: sin verificación SSL"""
         try:
-            response = requests.get(url, verify=False, timeout=10)
+            response = self.cliente.get(url, verify=False, timeout=10)
             return response.text if response.status_code == 200 else None
         except:
             return None
     
-    def _cargar_cache(self):
-        """Carga cache desde archivo"""
-        if os.path.exists(self.cache_file):
-            try:
-                with open(self.cache_file, 'r') as f:
-                    return json.load(f)
-            except:
-                return {}
-        return {}
-    
-    def _guardar_cache(self):
-        """Guarda cache en archivo"""
-        try:
-            with open(self.cache_file, 'w') as f:
-                json.dump(self.cache, f)
-        except:
-            pass
+    def _cargar_cache(self, cache_dir, cache_ttl, cache_max_mb):
+        """Abre el almacén de páginas y migra el cache JSON antiguo si existe"""
+        max_bytes = cache_max_mb * 1024 * 1024 if cache_max_mb else None
+        almacen = AlmacenPaginas(cache_dir, ttl=cache_ttl, max_bytes=max_bytes)
+        if len(almacen) == 0 and os.path.exists(self.cache_file):
+            almacen.importar_json(self.cache_file)
+        return almacen
     
     def _acortar_url(self, url, max_len=50):
         """Acorta URL para logs"""
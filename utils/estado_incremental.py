@@ -0,0 +1,70 @@
+# utils/estado_incremental.py
+import json
+import os
+import threading
+from datetime import datetime
+
+
+class EstadoIncremental:
+    """
+    Checkpoints persistentes para scraping incremental.
+    Guarda por clave (p.ej. "subreddit|query" o un video_id) la marca de agua
+    más reciente y los IDs ya ingeridos, para que la siguiente ejecución
+    solo traiga lo nuevo.
+    """
+
+    def __init__(self, ruta, max_ids_por_clave=20000):
+        self.ruta = ruta
+        self.max_ids_por_clave = max_ids_por_clave
+        self._lock = threading.Lock()
+        self._datos = self._cargar()
+        # Sets en memoria para búsquedas O(1); en disco se guardan como listas
+        self._ids = {clave: set(v.get('ids_vistos', [])) for clave, v in self._datos.items()}
+
+    def marca_agua(self, clave):
+        """Último timestamp (epoch) registrado para la clave, o None"""
+        with self._lock:
+            return self._datos.get(clave, {}).get('marca_agua')
+
+    def ids_vistos(self, clave):
+        """Copia del conjunto de IDs ya ingeridos para la clave"""
+        with self._lock:
+            return set(self._ids.get(clave, ()))
+
+    def registrar(self, clave, ids=(), marca_agua=None):
+        """Añade IDs vistos y sube la marca de agua si la nueva es mayor"""
+        with self._lock:
+            entrada = self._datos.setdefault(clave, {'marca_agua': None, 'ids_vistos': []})
+            vistos = self._ids.setdefault(clave, set())
+            nuevos = [i for i in ids if i and i not in vistos]
+            vistos.update(nuevos)
+            entrada['ids_vistos'].extend(nuevos)
+
+            # Se conservan solo los IDs más recientes
+            exceso = len(entrada['ids_vistos']) - self.max_ids_por_clave
+            if exceso > 0:
+                for viejo in entrada['ids_vistos'][:exceso]:
+                    vistos.discard(viejo)
+                del entrada['ids_vistos'][:exceso]
+
+            if marca_agua is not None and (entrada['marca_agua'] is None or marca_agua > entrada['marca_agua']):
+                entrada['marca_agua'] = marca_agua
+            entrada['actualizado'] = datetime.now().isoformat()
+
+    def guardar(self):
+        """Escribe el estado en disco de forma atómica"""
+        with self._lock:
+            tmp = f"{self.ruta}.tmp"
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(self._datos, f, ensure_ascii=False)
+            os.replace(tmp, self.ruta)
+
+    def _cargar(self):
+        if not os.path.exists(self.ruta):
+            return {}
+        try:
+            with open(self.ruta, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Estado incremental ilegible ({self.ruta}): {e}. Se empieza de cero")
+            return {}
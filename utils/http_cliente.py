@@ -0,0 +1,89 @@
+# utils/http_cliente.py
+import ssl
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class ClienteHTTP:
+    """
+    Capa HTTP compartida por todos los scrapers.
+    Un solo pool de conexiones keep-alive (HTTPAdapter) para que miles de
+    requests al mismo host reutilicen la conexión TCP/TLS.
+    Con http2=True usa httpx si está instalado (pip install httpx[http2]).
+    """
+
+    def __init__(self, pool_connections=10, pool_maxsize=32, http2=False):
+        self.pool_connections = pool_connections  # hosts distintos con pool propio
+        self.pool_maxsize = pool_maxsize          # conexiones abiertas por host
+
+        self.adaptador = self._crear_adaptador()
+        self.session = requests.Session()
+        self.montar_en(self.session)
+
+        # Sesión aparte para el último recurso verify=False (no contamina la principal)
+        self._session_insegura = None
+
+        self._httpx = None
+        if http2:
+            try:
+                import httpx
+                self._httpx = httpx.Client(
+                    http2=True,
+                    limits=httpx.Limits(
+                        max_connections=pool_maxsize * pool_connections,
+                        max_keepalive_connections=pool_maxsize
+                    )
+                )
+                print("⚡ Cliente HTTP/2 activo (httpx)")
+            except ImportError:
+                print("⚠️ httpx[http2] no instalado, se usa requests con keep-alive")
+
+    def montar_en(self, session):
+        """Hace que otra requests.Session (p.ej. de una librería) use este pool"""
+        session.mount('https://', self.adaptador)
+        session.mount('http://', self.adaptador)
+        return session
+
+    def get(self, url, **kwargs):
+        """GET con la misma firma que requests.get"""
+        if not kwargs.pop('verify', True):
+            return self._insegura().get(url, verify=False, **kwargs)
+        if self._httpx is not None:
+            return self._get_httpx(url, **kwargs)
+        return self.session.get(url, **kwargs)
+
+    def cerrar(self):
+        self.session.close()
+        if self._session_insegura is not None:
+            self._session_insegura.close()
+        if self._httpx is not None:
+            self._httpx.close()
+
+    def _crear_adaptador(self):
+        return HTTPAdapter(
+            pool_connections=self.pool_connections,
+            pool_maxsize=self.pool_maxsize,
+            max_retries=0  # los reintentos los decide PoliticaReintentos
+        )
+
+    def _insegura(self):
+        if self._session_insegura is None:
+            self._session_insegura = requests.Session()
+            self._session_insegura.mount('https://', self._crear_adaptador())
+        return self._session_insegura
+
+    def _get_httpx(self, url, **kwargs):
+        """Traduce la llamada a httpx y sus errores a las excepciones de requests"""
+        import httpx
+        kwargs['follow_redirects'] = kwargs.pop('allow_redirects', True)
+        try:
+            return self._httpx.get(url, **kwargs)
+        except httpx.TimeoutException as e:
+            raise requests.exceptions.Timeout(str(e)) from e
+        except httpx.ConnectError as e:
+            if isinstance(e.__context__, ssl.SSLError):
+                raise requests.exceptions.SSLError(str(e)) from e
+            raise requests.exceptions.ConnectionError(str(e)) from e
+        except httpx.TransportError as e:
+            raise requests.exceptions.ConnectionError(str(e)) from e
@@ -0,0 +1,82 @@
+# utils/limitador.py
+import random
+import threading
+import time
+from urllib.parse import urlparse
+
+
+class CubetaTokens:
+    """
+    Token bucket thread-safe: permite `capacidad` requests seguidos y luego
+    uno cada 1/tasa segundos. El jitter añade una espera aleatoria extra.
+    """
+
+    def __init__(self, tasa, capacidad=1, jitter=0.0):
+        self.tasa = tasa
+        self.capacidad = capacidad
+        self.jitter = jitter
+        self.tokens = float(capacidad)
+        self.ultima_recarga = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reservar(self):
+        """Reserva un token y devuelve cuántos segundos hay que esperar"""
+        with self._lock:
+            self._recargar()
+
+            # Los tokens pueden quedar en negativo: son turnos ya reservados
+            self.tokens -= 1
+            if self.tokens >= 0:
+                return 0.0
+
+            espera = -self.tokens / self.tasa
+            if self.jitter:
+                extra = random.uniform(0, self.jitter)
+                # El jitter también se descuenta para que el siguiente turno lo respete
+                self.tokens -= extra * self.tasa
+                espera += extra
+            return espera
+
+    def pausar(self, segundos):
+        """Retrasa el siguiente token `segundos` (backoff compartido por todos los hilos)"""
+        with self._lock:
+            self._recargar()
+            self.tokens = min(self.tokens, 0) - segundos * self.tasa
+
+    def _recargar(self):
+        ahora = time.monotonic()
+        self.tokens = min(self.capacidad, self.tokens + (ahora - self.ultima_recarga) * self.tasa)
+        self.ultima_recarga = ahora
+
+    def adquirir(self):
+        """Bloquea hasta que haya token. Devuelve el tiempo esperado"""
+        espera = self.reservar()
+        if espera > 0:
+            time.sleep(espera)
+        return espera
+
+
+class LimitadorPorHost:
+    """
+    Mantiene una CubetaTokens por dominio, así dos hosts distintos
+    no se bloquean entre sí pero cada uno ve el mismo ritmo educado.
+    """
+
+    def __init__(self, delay_min=3, delay_max=7, rafaga=1):
+        self.delay_min = delay_min
+        self.delay_max = delay_max
+        self.rafaga = rafaga
+        self._cubetas = {}
+        self._lock = threading.Lock()
+
+    def cubeta(self, url):
+        """Devuelve (creándola si hace falta) la cubeta del host de la URL"""
+        host = urlparse(url).netloc.lower()
+        with self._lock:
+            if host not in self._cubetas:
+                self._cubetas[host] = CubetaTokens(
+                    tasa=1.0 / max(self.delay_min, 0.001),
+                    capacidad=self.rafaga,
+                    jitter=max(self.delay_max - self.delay_min, 0)
+                )
+            return self._cubetas[host]
@@ -0,0 +1,148 @@
+# utils/parseo.py
+import re
+from bisect import bisect_left
+
+from bs4 import BeautifulSoup
+
+# lxml es varias veces más rápido que html.parser en páginas grandes de foros;
+# si no está instalado se usa el parser de la librería estándar
+try:
+    import lxml  # noqa: F401
+    PARSER_HTML = 'lxml'
+except ImportError:
+    PARSER_HTML = 'html.parser'
+
+# Patrones de clase compartidos por las heurísticas (compilados una vez por proceso)
+RE_AUTOR = re.compile(r'author|byline|writer|username', re.I)
+RE_FECHA = re.compile(r'date|time|posted|published', re.I)
+TAGS_TITULO = ('h1', 'h2', 'h3', 'h4')
+
+
+def parsear_html(html):
+    """Parsea HTML con el backend más rápido disponible"""
+    return BeautifulSoup(html, PARSER_HTML)
+
+
+class DocumentoPagina:
+    """
+    Una página descargada y compartida por todas las estrategias de scraping:
+    el HTML se parsea la primera vez que alguien pide `soup` y nunca más.
+    """
+
+    def __init__(self, url, html):
+        self.url = url
+        self.html = html
+        self._soup = None
+        self._indice = None
+        self.deteccion = None  # resultado de DetectorTipoPagina.analizar, cacheado aquí
+
+    @property
+    def soup(self):
+        if self._soup is None:
+            self._soup = parsear_html(self.html)
+        return self._soup
+
+    @property
+    def indice(self):
+        """IndiceClases del documento, construido la primera vez que se pide"""
+        if self._indice is None:
+            self._indice = IndiceClases(self.soup)
+        return self._indice
+
+
+class IndiceClases:
+    """
+    Índice de un documento parseado construido en una sola pasada:
+    token de clase → elementos y tag → elementos, en orden de documento (preorden).
+    Cada elemento guarda su rango [inicio, fin) de posiciones, así "el primer
+    descendiente con clase author" es un bisect sobre una lista en vez de un
+    find(class_=...) que recorre el subárbol.
+    """
+
+    def __init__(self, soup):
+        self.soup = soup
+        self._rangos = {}      # id(elemento) → (inicio, fin)
+        self._por_clase = {}   # token en minúsculas → [(posición, elemento)]
+        self._por_tag = {}     # nombre de tag → [(posición, elemento)]
+        self._cache = {}       # postings combinados por patrón/tags
+        self._indexar()
+
+    def _indexar(self):
+        posicion = 0
+        pila = [(self.soup, False)]
+        while pila:
+            elemento, cerrar = pila.pop()
+            if cerrar:
+                inicio = self._rangos[id(elemento)][0]
+                self._rangos[id(elemento)] = (inicio, posicion)
+                continue
+
+            self._rangos[id(elemento)] = (posicion, None)
+            if elemento is not self.soup:
+                self._por_tag.setdefault(elemento.name, []).append((posicion, elemento))
+                for token in elemento.get('class') or ():
+                    self._por_clase.setdefault(token.lower(), []).append((posicion, elemento))
+            posicion += 1
+
+            pila.append((elemento, True))
+            hijos = [h for h in elemento.contents if getattr(h, 'name', None)]
+            for hijo in reversed(hijos):
+                pila.append((hijo, False))
+
+    def con_clase(self, patron, dentro_de=None, tags=None):
+        """Elementos (en orden de documento) con algún token de clase que cumpla el regex"""
+        return [e for _, e in self._rango(self._postings_clase(patron), dentro_de, tags)]
+
+    def primero_con_clase(self, patron, dentro_de=None, tags=None):
+        """Primer descendiente con algún token de clase que cumpla el regex, o None"""
+        for _, elemento in self._rango(self._postings_clase(patron), dentro_de, tags):
+            return elemento
+        return None
+
+    def con_tag(self, nombres, dentro_de=None):
+        """Elementos con alguno de los tags dados, en orden de documento"""
+        return [e for _, e in self._rango(self._postings_tag(nombres), dentro_de)]
+
+    def primero_con_tag(self, nombres, dentro_de=None):
+        for _, elemento in self._rango(self._postings_tag(nombres), dentro_de):
+            return elemento
+        return None
+
+    def _rango(self, postings, dentro_de=None, tags=None):
+        """Itera los postings que caen dentro del subárbol (sin incluir la raíz)"""
+        if dentro_de is None:
+            inicio, fin = 0, float('inf')
+        else:
+            inicio, fin = self._rangos[id(dentro_de)]
+            inicio += 1
+        posiciones = postings[0]
+        i = bisect_left(posiciones, inicio)
+        while i < len(posiciones) and posiciones[i] < fin:
+            elemento = postings[1][i]
+            if tags is None or elemento.name in tags:
+                yield posiciones[i], elemento
+            i += 1
+
+    def _postings_clase(self, patron):
+        clave = ('clase', patron.pattern, patron.flags)
+        if clave not in self._cache:
+            tokens = [t for t in self._por_clase if patron.search(t)]
+            self._cache[clave] = self._combinar(self._por_clase[t] for t in tokens)
+        return self._cache[clave]
+
+    def _postings_tag(self, nombres):
+        if isinstance(nombres, str):
+            nombres = (nombres,)
+        clave = ('tag', tuple(nombres))
+        if clave not in self._cache:
+            self._cache[clave] = self._combinar(self._por_tag.get(n, []) for n in nombres)
+        return self._cache[clave]
+
+    def _combinar(self, listas):
+        """Une varias listas de postings en una (sin duplicados) ordenada por posición"""
+        unidos = {}
+        for lista in listas:
+            for posicion, elemento in lista:
+                unidos[posicion] = elemento
+        posiciones = sorted(unidos)
+        return posiciones, [unidos[p] for p in posiciones]
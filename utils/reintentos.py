@@ -0,0 +1,102 @@
+# utils/reintentos.py
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+
+class PoliticaReintentos:
+    """
+    Reintentos acotados con backoff exponencial + jitter.
+    Respeta la cabecera Retry-After y lleva métricas del tiempo esperado.
+    """
+
+    def __init__(self, max_intentos=4, espera_base=2.0, factor=2.0,
+                 espera_max=60.0, jitter=0.5, respetar_retry_after=True):
+        self.max_intentos = max_intentos
+        self.espera_base = espera_base
+        self.factor = factor
+        self.espera_max = espera_max
+        self.jitter = jitter  # fracción de la espera que se aleatoriza (0 = sin jitter)
+        self.respetar_retry_after = respetar_retry_after
+
+        self._lock = threading.Lock()
+        self.metricas = {
+            'reintentos': 0,
+            'segundos_esperando': 0.0,
+            'por_host': {}
+        }
+
+    def calcular_espera(self, intento, retry_after=None):
+        """Segundos a esperar antes del intento `intento + 1`"""
+        if self.respetar_retry_after and retry_after:
+            segundos = self._parsear_retry_after(retry_after)
+            if segundos is not None:
+                return min(segundos, self.espera_max)
+
+        espera = min(self.espera_base * self.factor ** (intento - 1), self.espera_max)
+        return random.uniform(espera * (1 - self.jitter), espera)
+
+    def registrar_espera(self, host, segundos):
+        """Suma un reintento y su espera a las métricas"""
+        with self._lock:
+            self.metricas['reintentos'] += 1
+            self.metricas['segundos_esperando'] += segundos
+            por_host = self.metricas['por_host']
+            por_host[host] = por_host.get(host, 0.0) + segundos
+
+    def resumen(self):
+        """Copia de las métricas actuales"""
+        with self._lock:
+            return {
+                'reintentos': self.metricas['reintentos'],
+                'segundos_esperando': round(self.metricas['segundos_esperando'], 1),
+                'por_host': {h: round(s, 1) for h, s in self.metricas['por_host'].items()}
+            }
+
+    def _parsear_retry_after(self, valor):
+        """Retry-After puede venir en segundos o como fecha HTTP"""
+        try:
+            return max(0.0, float(valor))
+        except (TypeError, ValueError):
+            pass
+        try:
+            return max(0.0, parsedate_to_datetime(valor).timestamp() - time.time())
+        except (TypeError, ValueError, IndexError):
+            return None
+
+
+class InterruptorCircuito:
+    """
+    Circuit breaker por host: tras `umbral_fallos` fallos seguidos el host
+    queda bloqueado `enfriamiento` segundos. Después se deja pasar un intento
+    de prueba; si falla, vuelve a abrirse.
+    """
+
+    def __init__(self, umbral_fallos=5, enfriamiento=120):
+        self.umbral_fallos = umbral_fallos
+        self.enfriamiento = enfriamiento
+        self._fallos = {}
+        self._abierto_hasta = {}
+        self._lock = threading.Lock()
+
+    def permite(self, host):
+        """True si se puede hacer un request al host"""
+        with self._lock:
+            return time.monotonic() >= self._abierto_hasta.get(host, 0)
+
+    def registrar_exito(self, host):
+        with self._lock:
+            self._fallos.pop(host, None)
+            self._abierto_hasta.pop(host, None)
+
+    def registrar_fallo(self, host):
+        """Cuenta un fallo. Devuelve True si el circuito acaba de abrirse"""
+        with self._lock:
+            self._fallos[host] = self._fallos.get(host, 0) + 1
+            if self._fallos[host] >= self.umbral_fallos:
+                self._abierto_hasta[host] = time.monotonic() + self.enfriamiento
+                # Tras el enfriamiento basta un fallo más para reabrirlo
+                self._fallos[host] = self.umbral_fallos - 1
+                return True
+            return False